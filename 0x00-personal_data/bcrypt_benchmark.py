@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Bcrypt benchmark module
+
+Measures hash_passwords throughput across bcrypt cost factors and worker
+counts.
+"""
+
+import argparse
+import os
+import time
+
+from encrypt_password import hash_passwords
+
+
+def main() -> None:
+    """Prints hashes per second for every cost/worker combination"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, nargs="+",
+                        default=[4, 8, 10, 12])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--count", type=int, default=32)
+    parser.add_argument("--processes", action="store_true")
+    args = parser.parse_args()
+
+    passwords = ["password-{}".format(i) for i in range(args.count)]
+    print("{:>6} {:>7} {:>10} {:>10}".format(
+        "rounds", "workers", "seconds", "hashes/s"))
+    for rounds in args.rounds:
+        for workers in args.workers:
+            started = time.perf_counter()
+            for _ in hash_passwords(passwords, rounds, workers,
+                                    args.processes):
+                pass
+            elapsed = time.perf_counter() - started
+            print("{:>6} {:>7} {:>10.3f} {:>10.1f}".format(
+                rounds, workers, elapsed, args.count / elapsed))
+
+
+if __name__ == "__main__":
+    main()
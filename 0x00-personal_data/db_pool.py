@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Db_pool module
+
+A small connection pool in the spirit of mysql.connector's
+MySQLConnectionPool, with health checks on checkout, age based recycling
+and wait/utilization statistics.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+class PoolError(Exception):
+    """Raised when no connection becomes available in time"""
+
+
+class PooledConnection:
+    """Connection proxy that goes back to its pool when closed"""
+
+    def __init__(self, pool: "ConnectionPool", connection, created: float):
+        self._pool = pool
+        self._connection = connection
+        self._created = created
+
+    def __getattr__(self, name: str):
+        if self._connection is None:
+            raise PoolError("connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Returns the connection to the pool"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection, self._created)
+
+
+class ConnectionPool:
+    """Fixed-size pool of connections built by ``factory``
+
+    Idle connections are checked with ``is_connected()`` when handed out
+    and replaced when broken or older than ``recycle`` seconds (a value
+    of 0 disables recycling). ``get_connection`` waits up to ``timeout``
+    seconds for a free slot before raising PoolError.
+    """
+
+    def __init__(
+        self,
+        factory: Callable,
+        size: int = 5,
+        recycle: float = 3600,
+        timeout: float = 30.0
+    ):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.factory = factory
+        self.size = size
+        self.recycle = recycle
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[object, float]] = []
+        self._in_use = 0
+        self._checkouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._broken = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def get_connection(self) -> PooledConnection:
+        """Checks out a healthy connection"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError("no connection available after {}s".format(
+                self.timeout))
+        waited = time.monotonic() - started
+        try:
+            connection, created = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, connection, created)
+
+    def _checkout(self) -> Tuple[object, float]:
+        """Returns an idle connection that passes checks, or a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, created = self._idle.pop()
+            if self.recycle and time.monotonic() - created > self.recycle:
+                self._discard(connection)
+                with self._lock:
+                    self._recycled += 1
+            elif not self._is_healthy(connection):
+                self._discard(connection)
+                with self._lock:
+                    self._broken += 1
+            else:
+                return connection, created
+        connection = self.factory()
+        with self._lock:
+            self._created += 1
+        return connection, time.monotonic()
+
+    @staticmethod
+    def _is_healthy(connection) -> bool:
+        """Returns True when the connection still reaches the server"""
+        try:
+            return bool(connection.is_connected())
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(connection) -> None:
+        """Closes a connection that leaves the pool"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def release(self, connection, created: float) -> None:
+        """Puts a checked out connection back in the idle list"""
+        with self._lock:
+            self._idle.append((connection, created))
+            self._in_use -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Returns checkout, wait time and utilization figures"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "utilization": self._in_use / self.size,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "broken": self._broken,
+                "wait_total": self._wait_total,
+                "wait_max": self._wait_max,
+                "wait_avg": self._wait_total / self._checkouts
+                if self._checkouts else 0.0,
+            }
+
+    def close(self) -> None:
+        """Closes every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+
+class FakeCursor:
+    """In-memory cursor returning canned rows"""
+
+    def __init__(self, description: Sequence[tuple], rows: Sequence[tuple]):
+        self.description = description
+        self._rows = list(rows)
+        self.statements: List[str] = []
+
+    def execute(self, statement: str, params: Sequence = ()) -> None:
+        """Records the statement"""
+        self.statements.append(statement)
+
+    def fetchmany(self, size: int = 1) -> List[tuple]:
+        """Returns the next size rows"""
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self) -> List[tuple]:
+        """Returns the remaining rows"""
+        return self.fetchmany(len(self._rows))
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self) -> None:
+        """Does nothing"""
+
+
+class FakeConnection:
+    """Connection stand-in for running pool code without a server
+
+    ``FakeConnection`` itself can be passed as a pool factory; every
+    cursor serves ``columns``/``rows`` given at construction.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str] = (),
+        rows: Sequence[tuple] = ()
+    ):
+        self.description = [(column,) for column in columns]
+        self.rows = rows
+        self.connected = True
+
+    def is_connected(self) -> bool:
+        """Returns False once closed or marked broken"""
+        return self.connected
+
+    def cursor(self, *args, **kwargs) -> FakeCursor:
+        """Returns a cursor over the canned rows"""
+        return FakeCursor(self.description, self.rows)
+
+    def close(self) -> None:
+        """Marks the connection closed"""
+        self.connected = False
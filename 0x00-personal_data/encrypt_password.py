@@ -2,14 +2,160 @@
 """Encrypt_password module
 """
 
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Iterator, Tuple
+
 import bcrypt
 
+DEFAULT_ROUNDS = 12
+
+_target_rounds = int(os.getenv("BCRYPT_ROUNDS", DEFAULT_ROUNDS))
+
+
+def get_target_rounds() -> int:
+    """Returns the cost used for new hashes"""
+    return _target_rounds
 
-def hash_password(password: str) -> bytes:
+
+def set_target_rounds(rounds: int) -> None:
+    """Sets the cost used for new hashes, e.g. from calibrate_rounds()"""
+    global _target_rounds
+    _target_rounds = rounds
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """Hashes a password with a randomly-generated salt using bcrypt."""
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode(),
+                         bcrypt.gensalt(rounds or _target_rounds))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
     """Checks if a provided password matches the hashed password."""
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """Returns the cost factor stored in a bcrypt hash."""
+    return int(hashed_password.split(b"$")[2])
+
+
+class Verification:
+    """Result of verify(): truthy when the password matched
+
+    ``needs_rehash`` is set when the password matched but the stored hash
+    was made with a cost other than the current target, so the caller
+    can store hash_password(password) after a successful login.
+    """
+
+    __slots__ = ("valid", "needs_rehash")
+
+    def __init__(self, valid: bool, needs_rehash: bool):
+        self.valid = valid
+        self.needs_rehash = needs_rehash
+
+    def __bool__(self) -> bool:
+        return self.valid
+
+    def __repr__(self) -> str:
+        return "Verification(valid={}, needs_rehash={})".format(
+            self.valid, self.needs_rehash)
+
+
+def verify(hashed_password: bytes, password: str) -> Verification:
+    """Checks a password like is_valid and reports an outdated cost."""
+    valid = is_valid(hashed_password, password)
+    return Verification(
+        valid, valid and hash_rounds(hashed_password) != _target_rounds)
+
+
+def calibrate_rounds(
+    budget_ms: float = 50.0,
+    percentile: float = 95.0,
+    samples: int = 10,
+    min_rounds: int = 4,
+    max_rounds: int = 16
+) -> int:
+    """Returns the highest cost whose hash latency fits the budget.
+
+    Each cost from ``min_rounds`` upwards is timed ``samples`` times on
+    this machine; calibration stops at the first cost whose
+    ``percentile`` latency exceeds ``budget_ms``. Since every extra round
+    doubles the work, costs are tried in increasing order only.
+    """
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        latencies = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        rank = max(math.ceil(percentile / 100 * len(latencies)) - 1, 0)
+        if latencies[rank] > budget_ms:
+            break
+        best = rounds
+    return best
+
+
+def _is_valid_pair(pair: Tuple[bytes, str]) -> bool:
+    """Unpacks a (hashed_password, password) pair for is_valid"""
+    return is_valid(*pair)
+
+
+def _ordered_map(
+    func: Callable,
+    items: Iterable,
+    workers: int = None,
+    processes: bool = False,
+    max_in_flight: int = None
+) -> Iterator:
+    """Yields func(item) in input order from a thread or process pool
+
+    At most ``max_in_flight`` items (default twice the worker count) are
+    submitted ahead of the consumer, so arbitrarily long inputs are
+    streamed with bounded memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    limit = max_in_flight or 2 * workers
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+
+
+def hash_passwords(
+    passwords: Iterable[str],
+    rounds: int = None,
+    workers: int = None,
+    processes: bool = False,
+    max_in_flight: int = None
+) -> Iterator[bytes]:
+    """Hashes many passwords concurrently, yielding hashes in order.
+
+    bcrypt releases the GIL while hashing, so threads scale across cores;
+    ``processes`` switches to a process pool.
+    """
+    hash_one = partial(hash_password, rounds=rounds or _target_rounds)
+    return _ordered_map(hash_one, passwords, workers, processes,
+                        max_in_flight)
+
+
+def verify_many(
+    pairs: Iterable[Tuple[bytes, str]],
+    workers: int = None,
+    processes: bool = False,
+    max_in_flight: int = None
+) -> Iterator[bool]:
+    """Checks many (hashed_password, password) pairs, in order."""
+    return _ordered_map(_is_valid_pair, pairs, workers, processes,
+                        max_in_flight)
@@ -3,25 +3,280 @@
 """
 
 import re
+import hashlib
+import hmac
 import logging
 import os
-import mysql.connector
-from mysql.connector.connection import MySQLConnection
-from typing import List
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import TYPE_CHECKING, Dict, Iterator, List, Sequence, Tuple
+
+from db_pool import ConnectionPool, PooledConnection
+
+if TYPE_CHECKING:
+    from mysql.connector.connection import MySQLConnection
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
 
+REDACTOR_CACHE_SIZE = 128
+REDACTION_MODES = ("regex", "scan", "automaton")
+AUTOMATON_MIN_FIELDS = 200
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest", "block")
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+class Redactor:
+    """Compiled redaction of ``field=value`` pairs for a fixed field set
+
+    ``mode`` selects the matching strategy, all of which produce the same
+    output:
+
+    - ``"regex"`` substitutes with a compiled alternation;
+    - ``"scan"`` splits the message once on the separator and looks keys
+      up in a frozenset;
+    - ``"automaton"`` finds every ``=`` and walks a trie of the reversed
+      field names backwards from it, so the cost does not grow with the
+      number of fields. Lists shorter than AUTOMATON_MIN_FIELDS use the
+      regex.
+
+    Modes that cannot handle the field names or separator fall back to
+    the regex. With a ``tokenizer`` each value is replaced by
+    ``tokenizer(value)`` instead of ``redaction``. ``redact(message)`` is
+    bound to the selected strategy.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        redaction: str,
+        separator: str,
+        mode: str = "regex",
+        tokenizer: "Tokenizer" = None
+    ):
+        if mode not in REDACTION_MODES:
+            raise ValueError("unknown redaction mode: {}".format(mode))
+        self.fields = tuple(fields)
+        self.redaction = redaction
+        self.separator = separator
+        self.pattern = re.compile(
+            rf'({"|".join(map(re.escape, self.fields))})'
+            rf'=(.*?)(?={re.escape(separator)})')
+        self.tokenizer = tokenizer
+        if tokenizer is None:
+            self._replacement = r"\g<1>=" + redaction.replace("\\", r"\\")
+        else:
+            self._replacement = \
+                lambda m: m.group(1) + "=" + tokenizer(m.group(2))
+        self._field_set = frozenset(self.fields)
+        self._masked_value = "=" + redaction
+        if not self._supports(mode):
+            mode = "regex"
+        self.mode = mode
+        if mode == "scan":
+            self.redact = self._scan
+        elif mode == "automaton":
+            self._trie = self._build_trie(self.fields)
+            self.redact = self._walk
+        else:
+            self.redact = self._substitute
+
+    def _supports(self, mode: str) -> bool:
+        """Tells whether mode gives the regex output for these settings"""
+        if mode == "regex":
+            return True
+        if not self.fields or any("=" in f for f in self.fields):
+            return False
+        if mode == "scan":
+            return len(self.separator) == 1 and self.separator != "=" \
+                and not any(self.separator in f for f in self.fields)
+        return len(self.fields) >= AUTOMATON_MIN_FIELDS \
+            and bool(self.separator) and all(self.fields)
+
+    @staticmethod
+    def _build_trie(fields: Sequence[str]) -> dict:
+        """Builds a trie of the reversed field names
+
+        Nodes map a character to the next node; the ``""`` key marks the
+        end of a field name.
+        """
+        root: dict = {}
+        for field in fields:
+            node = root
+            for char in reversed(field):
+                node = node.setdefault(char, {})
+            node[""] = True
+        return root
+
+    def _substitute(self, message: str) -> str:
+        """Redacts message with the compiled regex"""
+        return self.pattern.sub(self._replacement, message)
+
+    def _scan(self, message: str) -> str:
+        """Redacts message with a single split on the separator
+
+        A segment ``key=value`` is redacted when a field is a suffix of
+        ``key`` (which is what the regex matches) and ``value`` holds no
+        newline. Segments with several ``=`` are handed to the regex so
+        the output stays identical; the text after the last separator is
+        never redacted.
+        """
+        separator = self.separator
+        field_set = self._field_set
+        fields = self.fields
+        parts = message.split(separator)
+        for i in range(len(parts) - 1):
+            key, equals, value = parts[i].partition("=")
+            if not equals:
+                continue
+            if "=" in value:
+                parts[i] = self.pattern.sub(
+                    self._replacement, parts[i] + separator)[:-1]
+            elif (key in field_set or key.endswith(fields)) \
+                    and "\n" not in value:
+                if self.tokenizer is None:
+                    parts[i] = key + self._masked_value
+                else:
+                    parts[i] = key + "=" + self.tokenizer(value)
+        return separator.join(parts)
+
+    def _walk(self, message: str) -> str:
+        """Redacts message by matching field names backwards from each ``=``
+
+        For every ``=`` the trie gives the longest field name ending there
+        and starting after the previous redaction, which is where the
+        regex would match. The value runs to the next separator and is
+        left alone if it holds a newline, as ``.`` would not match it.
+        """
+        trie = self._trie
+        separator = self.separator
+        redaction = self.redaction
+        tokenizer = self.tokenizer
+        pieces = []
+        position = 0
+        equals = message.find("=")
+        while equals != -1:
+            node = trie
+            start = -1
+            k = equals - 1
+            while k >= position:
+                node = node.get(message[k])
+                if node is None:
+                    break
+                if "" in node:
+                    start = k
+                k -= 1
+            if start != -1:
+                end = message.find(separator, equals + 1)
+                if end == -1:
+                    break
+                value = message[equals + 1:end]
+                if "\n" not in value:
+                    pieces.append(message[position:equals + 1])
+                    pieces.append(redaction if tokenizer is None
+                                  else tokenizer(value))
+                    position = end
+            equals = message.find("=", max(equals + 1, position))
+        if not pieces:
+            return message
+        pieces.append(message[position:])
+        return "".join(pieces)
+
+    def render_row(self, columns: Sequence[str], row: Sequence) -> str:
+        """Renders a row as ``col=value; ...;`` with PII columns redacted
+
+        Columns are matched once per column set with the same rule as the
+        regex (a field is a suffix of the column name), so the result is
+        what redacting the rendered string would give, without scanning
+        the values.
+        """
+        prefixes, masked = _row_plan(self.fields, tuple(columns))
+        redaction = self.redaction
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            return "; ".join([
+                prefix + (tokenizer(str(value)) if mask else str(value))
+                for prefix, mask, value in zip(prefixes, masked, row)
+            ]) + ";"
+        return "; ".join([
+            prefix + (redaction if mask else str(value))
+            for prefix, mask, value in zip(prefixes, masked, row)
+        ]) + ";"
+
+
+class Tokenizer:
+    """Deterministic keyed tokens for redacted values
+
+    A value maps to the first ``length`` hex digits of its HMAC-SHA256
+    under ``key``, so the same value gets the same token across records
+    without being recoverable. Tokens of the ``cache_size`` most recently
+    used values are cached; stats() reports the hit rate.
+    """
+
+    def __init__(self, key: bytes, cache_size: int = 4096, length: int = 16):
+        self.key = key
+        self.length = length
+        self._cached = lru_cache(maxsize=cache_size)(self._token)
+
+    def _token(self, value: str) -> str:
+        """Computes the token of value"""
+        return hmac.new(self.key, value.encode(),
+                        hashlib.sha256).hexdigest()[:self.length]
+
+    def __call__(self, value: str) -> str:
+        return self._cached(value)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns cache hits, misses and hit rate"""
+        info = self._cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def _row_plan(
+    fields: Tuple[str, ...],
+    columns: Tuple[str, ...]
+) -> Tuple[Tuple[str, ...], Tuple[bool, ...]]:
+    """Returns the ``col=`` prefixes and PII mask for a column set"""
+    prefixes = tuple(column + "=" for column in columns)
+    masked = tuple(column.endswith(fields) for column in columns)
+    return prefixes, masked
+
+
+@lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def get_redactor(
+    fields: Sequence[str],
+    redaction: str,
+    separator: str,
+    mode: str = "regex",
+    tokenizer: Tokenizer = None
+) -> Redactor:
+    """Returns the shared Redactor for a hashable field set"""
+    return Redactor(fields, redaction, separator, mode, tokenizer)
+
 
 def filter_datum(
     fields: List[str],
     redaction: str,
     message: str,
-    separator: str
+    separator: str,
+    mode: str = "regex"
 ) -> str:
     """Logs message"""
-    return re.sub(
-        rf'({"|".join(map(re.escape, fields))})=.*?(?={re.escape(separator)})',
-        lambda m: f"{m.group(1)}={redaction}", message)
+    return get_redactor(
+        tuple(fields), redaction, separator, mode).redact(message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -32,36 +287,255 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
+    def __init__(
+        self,
+        fields: List[str],
+        mode: str = "regex",
+        tokenizer: Tokenizer = None
+    ):
+        """``tokenizer`` replaces values with keyed tokens, see Tokenizer"""
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.redactor = get_redactor(
+            tuple(fields), self.REDACTION, self.SEPARATOR, mode, tokenizer)
 
     def format(self, record: logging.LogRecord) -> str:
-        """Configure logging format"""
-        record.msg = filter_datum(
-                self.fields,
-                self.REDACTION,
-                record.getMessage(),
-                self.SEPARATOR
-            )
+        """Configure logging format
+
+        Records carrying ``columns`` and ``row`` attributes (see log_row)
+        are rendered from the row with PII columns replaced by index.
+        """
+        row = getattr(record, "row", None)
+        if row is not None:
+            record.msg = self.redactor.render_row(record.columns, row)
+        else:
+            record.msg = self.redactor.redact(record.getMessage())
+        record.args = None
         return super().format(record)
 
 
-def get_logger() -> logging.Logger:
-    """Creates and returns a logger configured to redact PII fields"""
+class _DrainingListener(QueueListener):
+    """QueueListener whose stop sentinel waits for room in a full queue"""
+
+    def enqueue_sentinel(self) -> None:
+        """Blocks until the sentinel fits so no queued record is lost"""
+        self.queue.put(self._sentinel)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler with a bounded queue, an overflow policy and counters
+
+    Records are enqueued untouched: the redaction and the write happen on
+    the listener thread started by ``listen``. When the queue is full,
+    ``overflow`` decides whether the new record is dropped
+    (``"drop_new"``), the oldest queued record is dropped
+    (``"drop_oldest"``) or the caller waits (``"block"``). Closing the
+    handler, which logging.shutdown does at exit, drains the queue.
+    """
+
+    def __init__(self, maxsize: int = 10000, overflow: str = "drop_new"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("unknown overflow policy: {}".format(overflow))
+        super().__init__(queue.Queue(maxsize))
+        self.overflow = overflow
+        self.queued = 0
+        self.dropped = 0
+        self.listener = None
+
+    def listen(self, *handlers: logging.Handler) -> None:
+        """Starts the worker thread writing to handlers"""
+        self.listener = _DrainingListener(
+            self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Leaves formatting to the listener thread"""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Enqueues record, applying the overflow policy when full"""
+        if self.overflow == "block":
+            self.queue.put(record)
+            self.queued += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == "drop_new":
+                self.dropped += 1
+                return
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+                return
+        self.queued += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the queued, dropped and pending record counts"""
+        return {
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "pending": self.queue.qsize(),
+        }
+
+    def close(self) -> None:
+        """Flushes queued records and stops the worker thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """Rate limits and samples records before they reach a handler
+
+    Records are grouped by logger name, level and message template (the
+    unformatted ``msg``). Each group has a token bucket holding up to
+    ``burst`` tokens (at least 1, by default ``max(rate, 1)``) refilled at
+    ``rate`` per second (no limit when ``rate`` is None); a record that
+    gets a token is then kept with probability ``sample``. Attached to a
+    logger, the filter runs before any formatting, so a dropped record
+    costs a dictionary lookup.
+
+    At most every ``summary_interval`` seconds, the next filtered record
+    also sends a WARNING through the logger counting the suppressed
+    records per logger and level. Only the ``max_groups`` most recently
+    seen groups keep their bucket.
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: float = None,
+        sample: float = 1.0,
+        summary_interval: float = 60.0,
+        max_groups: int = 1024
+    ):
+        super().__init__()
+        if burst is None:
+            burst = max(rate or 0, 1)
+        if burst < 1:
+            raise ValueError("burst must be at least 1, got {}".format(burst))
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample
+        self.summary_interval = summary_interval
+        self.max_groups = max_groups
+        self._buckets: OrderedDict = OrderedDict()
+        self._suppressed: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self._next_summary = time.monotonic() + summary_interval
+
+    def _take_token(self, group: tuple, now: float) -> bool:
+        """Spends a token of group's bucket if one is available"""
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            bucket = self._buckets[group] = [self.burst, now]
+            if len(self._buckets) > self.max_groups:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(group)
+            bucket[0] = min(self.burst,
+                            bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Returns False for records that are rate limited or sampled out"""
+        if getattr(record, "suppression_summary", False):
+            return True
+        msg = record.msg if isinstance(record.msg, str) else type(record.msg)
+        group = (record.name, record.levelno, msg)
+        now = time.monotonic()
+        with self._lock:
+            keep = (self.rate is None or self._take_token(group, now)) \
+                and (self.sample >= 1 or random.random() < self.sample)
+            if not keep:
+                key = (record.name, record.levelno)
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            summary = None
+            if now >= self._next_summary:
+                self._next_summary = now + self.summary_interval
+                summary, self._suppressed = self._suppressed, {}
+        if summary:
+            self._emit_summary(record.name, summary)
+        return keep
+
+    def _emit_summary(
+        self,
+        name: str,
+        suppressed: Dict[Tuple[str, int], int]
+    ) -> None:
+        """Logs how many records each logger and level lost"""
+        logger = logging.getLogger(name)
+        counts = ", ".join(
+            "{} {}: {}".format(logger_name, logging.getLevelName(level),
+                               count)
+            for (logger_name, level), count in sorted(suppressed.items()))
+        record = logger.makeRecord(
+            name, logging.WARNING, __file__, 0,
+            "suppressed %d records in the last %gs (%s)",
+            (sum(suppressed.values()), self.summary_interval, counts), None,
+            extra={"suppression_summary": True})
+        logger.handle(record)
+
+
+def get_logger(
+    queued: bool = False,
+    queue_size: int = 10000,
+    overflow: str = "drop_new",
+    log_filter: logging.Filter = None
+) -> logging.Logger:
+    """Creates and returns a logger configured to redact PII fields
+
+    With ``queued`` the caller only enqueues records and a background
+    thread formats and writes them (see BoundedQueueHandler). Repeated
+    calls reuse the installed handler instead of stacking a new one.
+    ``log_filter``, e.g. a SamplingFilter, is attached to the logger so
+    it runs before any handler or formatter.
+    """
     logger = logging.getLogger("user_data")
     logger.setLevel(logging.INFO)
     logger.propagate = False
+    if log_filter is not None:
+        logger.addFilter(log_filter)
+
+    if any(isinstance(handler, BoundedQueueHandler) == queued
+           for handler in logger.handlers):
+        return logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
 
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(RedactingFormatter(fields=PII_FIELDS))
-    logger.addHandler(stream_handler)
+    if queued:
+        queue_handler = BoundedQueueHandler(queue_size, overflow)
+        queue_handler.listen(stream_handler)
+        logger.addHandler(queue_handler)
+    else:
+        logger.addHandler(stream_handler)
 
     return logger
 
 
-def get_db() -> MySQLConnection:
-    """Returns a MySQL database connection using environment variables."""
+def get_db() -> "MySQLConnection":
+    """Returns a MySQL database connection using environment variables.
+
+    The driver is imported here so that importing this module for
+    redaction alone does not load mysql.connector.
+    """
+    import mysql.connector
+
     return mysql.connector.connect(
         user=os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
         password=os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
@@ -70,20 +544,68 @@ def get_db() -> MySQLConnection:
     )
 
 
-def main() -> None:
-    """Main function to fetch and log user data with sensitive fields redacted."""
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    logger = get_logger()
+def get_db_pool() -> ConnectionPool:
+    """Returns the process-wide pool of get_db connections
+
+    Sized by ``PERSONAL_DATA_DB_POOL_SIZE`` (default 5); connections older
+    than ``PERSONAL_DATA_DB_POOL_RECYCLE`` seconds (default 3600) are
+    replaced on checkout.
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ConnectionPool(
+                get_db,
+                size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", "5")),
+                recycle=float(
+                    os.getenv("PERSONAL_DATA_DB_POOL_RECYCLE", "3600")))
+        return _db_pool
 
-    field_names = [desc[0] for desc in cursor.description]
-    for row in cursor:
-        message = "; ".join(f"{k}={v}" for k, v in zip(field_names, row)) + ";"
-        logger.info(message)
 
-    cursor.close()
-    db.close()
+def get_pooled_db() -> PooledConnection:
+    """Checks out a connection from get_db_pool(); close() returns it"""
+    return get_db_pool().get_connection()
+
+
+def fetch_rows(cursor, batch_size: int) -> Iterator[tuple]:
+    """Yields the rows of an executed cursor, fetched in batches"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def log_row(
+    logger: logging.Logger,
+    columns: Sequence[str],
+    row: Sequence
+) -> None:
+    """Logs a row as structured data for RedactingFormatter to render"""
+    logger.info("", extra={"columns": columns, "row": row})
+
+
+def main(batch_size: int = None) -> None:
+    """Main function to fetch and log user data with sensitive fields redacted.
+
+    Rows are streamed from an unbuffered cursor in batches of
+    ``batch_size`` (``PERSONAL_DATA_BATCH_SIZE``, default 1000) so memory
+    stays flat regardless of the size of the users table.
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv("PERSONAL_DATA_BATCH_SIZE", "1000"))
+    db = get_db()
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute("SELECT * FROM users;")
+        logger = get_logger()
+
+        field_names = [desc[0] for desc in cursor.description]
+        for row in fetch_rows(cursor, batch_size):
+            log_row(logger, field_names, row)
+    finally:
+        cursor.close()
+        db.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Import benchmark module
+
+Measures the import time of the redaction modules with
+``python -X importtime`` in fresh interpreters and checks that none of
+them loads the database driver.
+
+    python3 import_benchmark.py --budget-ms 50
+
+Exits with status 1 when a module imports mysql.connector or when its
+best cumulative import time exceeds the budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULES = ("filtered_logger", "redact_log", "redact_csv")
+FORBIDDEN = ("mysql",)
+
+
+def import_profile(module: str) -> Tuple[int, List[str]]:
+    """Imports module in a new interpreter
+
+    Returns its cumulative import time in microseconds and the names of
+    every module imported along the way.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import {}".format(module)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True)
+    cumulative = 0
+    names = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        if not total.strip().isdigit():
+            continue
+        name = name.strip()
+        names.append(name)
+        if name == module:
+            cumulative = int(total)
+    return cumulative, names
+
+
+def main() -> None:
+    """Prints import times and enforces the budget"""
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    print("{:<16} {:>9} {:>9}".format("module", "best ms", "median ms"))
+    for module in MODULES:
+        timings = []
+        loaded: Dict[str, None] = {}
+        for _ in range(args.runs):
+            cumulative, names = import_profile(module)
+            timings.append(cumulative / 1000)
+            loaded.update(dict.fromkeys(names))
+        best = min(timings)
+        print("{:<16} {:>9.2f} {:>9.2f}".format(
+            module, best, statistics.median(timings)))
+        leaked = [name for name in loaded
+                  if name.split(".")[0] in FORBIDDEN]
+        if leaked:
+            print("{} imports {}".format(module, ", ".join(leaked)),
+                  file=sys.stderr)
+            failed = True
+        if args.budget_ms is not None and best > args.budget_ms:
+            print("{} takes {:.2f} ms, budget is {} ms".format(
+                module, best, args.budget_ms), file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
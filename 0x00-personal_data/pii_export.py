@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Pii_export module
+
+Exports several tables in parallel with their PII columns redacted. Each
+table runs on its own pooled connection (see filtered_logger.get_db_pool)
+in a bounded thread pool, and its rows stream to ``<table>.log`` in the
+output directory as ``col=value; ...;`` lines.
+
+    python3 pii_export.py --tables users orders --workers 4 --policy p.json
+
+The optional policy file maps table names to the fields to redact; the
+``"*"`` entry, or PII_FIELDS, applies to tables it does not list.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+from filtered_logger import (PII_FIELDS, RedactingFormatter, fetch_rows,
+                             get_db_pool, get_pooled_db, get_redactor)
+
+
+def quote_identifier(name: str) -> str:
+    """Quotes a MySQL identifier"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def discover_tables() -> List[str]:
+    """Returns the tables of the configured database"""
+    with get_pooled_db() as db:
+        cursor = db.cursor()
+        try:
+            cursor.execute("SHOW TABLES;")
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+
+class Progress:
+    """Thread-safe row counter printing rows/s at most every interval"""
+
+    def __init__(self, interval: float = 5.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.rows = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, table: str, rows: int) -> None:
+        """Counts rows exported from table"""
+        with self._lock:
+            self.rows += rows
+            now = time.monotonic()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            total = self.rows
+        self.report("{} rows".format(total), total, now)
+
+    def done(self, table: str, rows: int, started: float) -> None:
+        """Reports a finished table"""
+        self.report("{}: {} rows".format(table, rows), rows,
+                    time.monotonic(), started)
+
+    def report(
+        self,
+        label: str,
+        rows: int,
+        now: float,
+        started: float = None
+    ) -> None:
+        """Prints label with the rows/s since started"""
+        elapsed = max(now - (started or self.started), 1e-9)
+        print("{} ({:.0f} rows/s)".format(label, rows / elapsed),
+              file=self.stream)
+
+
+def export_table(
+    table: str,
+    fields: Sequence[str],
+    output_dir: str,
+    batch_size: int,
+    progress: Progress
+) -> int:
+    """Streams one redacted table to output_dir, returns the row count"""
+    started = time.monotonic()
+    redactor = get_redactor(tuple(fields), RedactingFormatter.REDACTION,
+                            RedactingFormatter.SEPARATOR)
+    path = os.path.join(output_dir, os.path.basename(table) + ".log")
+    count = 0
+    with get_pooled_db() as db, open(path, "w") as out:
+        cursor = db.cursor(buffered=False)
+        try:
+            cursor.execute("SELECT * FROM {};".format(
+                quote_identifier(table)))
+            columns = [desc[0] for desc in cursor.description]
+            batch = 0
+            for row in fetch_rows(cursor, batch_size):
+                out.write(redactor.render_row(columns, row))
+                out.write("\n")
+                batch += 1
+                if batch == batch_size:
+                    progress.add(table, batch)
+                    count += batch
+                    batch = 0
+            progress.add(table, batch)
+            count += batch
+        finally:
+            cursor.close()
+    progress.done(table, count, started)
+    return count
+
+
+def export_tables(
+    tables: Sequence[str] = None,
+    policies: Dict[str, Sequence[str]] = None,
+    workers: int = 4,
+    output_dir: str = ".",
+    batch_size: int = 1000,
+    progress: Progress = None
+) -> Dict[str, int]:
+    """Exports tables (all of them by default), returns rows per table
+
+    Each worker holds a pooled connection for a whole table, so there are
+    never more workers than connections in get_db_pool(); more would wait
+    on the pool and fail with PoolError on its timeout.
+    """
+    if not tables:
+        tables = discover_tables()
+    policies = policies or {}
+    default = policies.get("*", PII_FIELDS)
+    progress = progress or Progress()
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers, get_db_pool().size))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            table: executor.submit(export_table, table,
+                                   policies.get(table, default), output_dir,
+                                   batch_size, progress)
+            for table in tables
+        }
+        counts = {table: future.result() for table, future in futures.items()}
+    progress.report("total: {} rows".format(sum(counts.values())),
+                    sum(counts.values()), time.monotonic())
+    return counts
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Export tables with PII "
+                                     "columns redacted")
+    parser.add_argument("--tables", nargs="+",
+                        help="tables to export (default: all)")
+    parser.add_argument("--policy", help="JSON file of fields per table")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--batch-size", type=int, default=int(
+        os.getenv("PERSONAL_DATA_BATCH_SIZE", "1000")))
+    args = parser.parse_args()
+
+    policies = None
+    if args.policy:
+        with open(args.policy) as f:
+            policies = json.load(f)
+    export_tables(args.tables, policies, args.workers, args.output_dir,
+                  args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Redact_csv module
+
+Sanitizes CSV exports shaped like user_data.csv: columns matching
+PII_FIELDS are replaced with the redaction string. The input is split
+into byte ranges that end on row boundaries, the ranges are redacted in
+a process pool and the output is written in input order.
+
+    python3 redact_csv.py user_data.csv redacted.csv --workers 8
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import List, Sequence, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+READ_BLOCK_SIZE = 1 << 20
+
+
+def row_chunks(
+    path: str,
+    start: int,
+    chunk_size: int
+) -> List[Tuple[int, int]]:
+    """Splits path from start into byte ranges of about chunk_size
+
+    Every range ends right after a newline that is outside a quoted
+    field, so quoted values holding separators or line breaks are never
+    split across ranges. Quote parity is tracked over the whole file.
+    """
+    size = os.path.getsize(path)
+    bounds = [start]
+    target = start + chunk_size
+    in_quotes = False
+    pos = start
+    with open(path, "rb") as f:
+        f.seek(start)
+        while target < size:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            i = 0
+            while True:
+                offset = target - pos
+                if offset >= len(block):
+                    in_quotes ^= bool(block.count(b'"', i) & 1)
+                    break
+                if offset > i:
+                    in_quotes ^= bool(block.count(b'"', i, offset) & 1)
+                    i = offset
+                newline = block.find(b"\n", i)
+                if newline == -1:
+                    in_quotes ^= bool(block.count(b'"', i) & 1)
+                    target = pos + len(block)
+                    break
+                in_quotes ^= bool(block.count(b'"', i, newline) & 1)
+                i = newline + 1
+                if not in_quotes:
+                    bounds.append(pos + i)
+                    target = pos + i + chunk_size
+            pos += len(block)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def pii_mask(
+    columns: Sequence[str],
+    fields: Sequence[str]
+) -> Tuple[bool, ...]:
+    """Flags the columns that filter_datum would redact"""
+    return tuple(column.endswith(tuple(fields)) for column in columns)
+
+
+def redact_chunk(task: tuple) -> bytes:
+    """Redacts the rows of one byte range and returns them as CSV"""
+    path, start, end, mask, redaction = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode()
+    output = io.StringIO()
+    writer = csv.writer(output, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    for row in csv.reader(io.StringIO(text, newline="")):
+        writer.writerow([
+            redaction if i < len(mask) and mask[i] else value
+            for i, value in enumerate(row)
+        ])
+    return output.getvalue().encode()
+
+
+def redact_csv(
+    src: str,
+    dst: str,
+    fields: Sequence[str] = PII_FIELDS,
+    redaction: str = RedactingFormatter.REDACTION,
+    workers: int = None,
+    chunk_size: int = 16 << 20
+) -> int:
+    """Writes a redacted copy of src to dst and returns the bytes read"""
+    with open(src, "rb") as f:
+        header = f.readline()
+    columns = next(csv.reader([header.decode()]))
+    mask = pii_mask(columns, fields)
+    tasks = [(src, start, end, mask, redaction)
+             for start, end in row_chunks(src, len(header), chunk_size)]
+
+    with open(dst, "wb") as out, Pool(workers) as pool:
+        out.write(header)
+        for data in pool.imap(redact_chunk, tasks):
+            out.write(data)
+    return os.path.getsize(src)
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Redact PII columns of "
+                                     "a CSV file")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--fields", nargs="+", default=list(PII_FIELDS))
+    parser.add_argument("--redaction", default=RedactingFormatter.REDACTION)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=16,
+                        help="target chunk size in MB")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    size = redact_csv(args.src, args.dst, args.fields, args.redaction,
+                      args.workers, args.chunk_size << 20)
+    elapsed = time.perf_counter() - started
+    print("{:.1f} MB in {:.2f}s ({:.1f} MB/s)".format(
+        size / 1e6, elapsed, size / 1e6 / elapsed), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
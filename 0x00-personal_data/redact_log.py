@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Redact_log module
+
+Redacts existing log files with the same matching rules as filter_datum.
+The input is memory-mapped and scanned with a compiled bytes pattern;
+untouched spans are written straight from the mapping, so resident
+memory does not grow with the size of the file.
+
+    python3 redact_log.py myapp.log myapp.redacted.log
+"""
+
+import argparse
+import mmap
+import re
+import sys
+import time
+from typing import Sequence
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+
+def compile_bytes_pattern(
+    fields: Sequence[str],
+    separator: str
+) -> re.Pattern:
+    """Returns the bytes equivalent of the filter_datum pattern"""
+    names = b"|".join(re.escape(field.encode()) for field in fields)
+    return re.compile(
+        b"(" + names + b")=.*?(?=" + re.escape(separator.encode()) + b")")
+
+
+def redact_log_file(
+    src: str,
+    dst: str,
+    fields: Sequence[str] = PII_FIELDS,
+    redaction: str = RedactingFormatter.REDACTION,
+    separator: str = RedactingFormatter.SEPARATOR
+) -> int:
+    """Writes a redacted copy of src to dst, returns the redaction count"""
+    pattern = compile_bytes_pattern(fields, separator)
+    masked = redaction.encode()
+    count = 0
+    with open(src, "rb") as f, open(dst, "wb") as out:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return 0
+        with mapped, memoryview(mapped) as view:
+            position = 0
+            for match in pattern.finditer(mapped):
+                out.write(view[position:match.end(1) + 1])
+                out.write(masked)
+                position = match.end()
+                count += 1
+            out.write(view[position:])
+    return count
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Redact PII fields of "
+                                     "a log file")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--fields", nargs="+", default=list(PII_FIELDS))
+    parser.add_argument("--redaction", default=RedactingFormatter.REDACTION)
+    parser.add_argument("--separator", default=RedactingFormatter.SEPARATOR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = redact_log_file(args.src, args.dst, args.fields,
+                            args.redaction, args.separator)
+    elapsed = time.perf_counter() - started
+    print("{} values redacted in {:.2f}s".format(count, elapsed),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
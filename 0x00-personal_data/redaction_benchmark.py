@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Redaction benchmark module
+
+Compares the redaction modes of filter_datum across message length
+(number of ``key=value`` pairs) and number of redacted fields. A quarter of
+the message keys are redacted; longer field lists add names that never
+occur, as large compliance lists do; the automaton mode uses the regex below
+AUTOMATON_MIN_FIELDS fields.
+"""
+
+import argparse
+import hashlib
+import timeit
+from typing import List
+
+from filtered_logger import REDACTION_MODES, filter_datum
+
+
+def field_names(count: int) -> List[str]:
+    """Returns count distinct, unrelated column names"""
+    return ["c" + hashlib.sha1(str(i).encode()).hexdigest()[:7]
+            for i in range(count)]
+
+
+def build_message(pairs: int, separator: str = ";") -> str:
+    """Builds a message with ``pairs`` key=value entries"""
+    return "".join(
+        "{}=value-{}{}".format(name, i * 7919, separator)
+        for i, name in enumerate(field_names(pairs)))
+
+
+def build_fields(pairs: int, count: int) -> List[str]:
+    """Returns count field names, a quarter of the message keys first"""
+    names = field_names(max(pairs, count) * 4)
+    in_message = names[:pairs:4]
+    return (in_message + names[max(pairs, count):])[:count]
+
+
+def bench(mode: str, fields: List[str], message: str, number: int) -> float:
+    """Returns the mean time of one filter_datum call in microseconds"""
+    timer = timeit.Timer(
+        lambda: filter_datum(fields, "***", message, ";", mode))
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e6
+
+
+def main() -> None:
+    """Prints a table of timings for every mode"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, nargs="+",
+                        default=[5, 20, 100, 500])
+    parser.add_argument("--fields", type=int, nargs="+",
+                        default=[1, 5, 20, 100, 500])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    header = "{:>6} {:>6} ".format("pairs", "fields") + " ".join(
+        "{:>10}".format(mode + " us") for mode in REDACTION_MODES)
+    print(header)
+    for pairs in args.pairs:
+        message = build_message(pairs)
+        for count in args.fields:
+            fields = build_fields(pairs, count)
+            outputs = {filter_datum(fields, "***", message, ";", mode)
+                       for mode in REDACTION_MODES}
+            assert len(outputs) == 1, "redaction modes disagree"
+            timings = [bench(mode, fields, message, args.number)
+                       for mode in REDACTION_MODES]
+            print("{:>6} {:>6} ".format(pairs, count) + " ".join(
+                "{:>10.2f}".format(t) for t in timings))
+
+
+if __name__ == "__main__":
+    main()
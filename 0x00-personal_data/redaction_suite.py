@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Redaction suite module
+
+Reproducible throughput suite for filter_datum and
+RedactingFormatter.format. Synthetic records shaped like user_data.csv
+are generated from a fixed seed for several column counts, PII densities
+and field list sizes. Each case reports records/s, bytes/s and the peak
+bytes allocated while redacting one record. Next to each masked
+``format`` case, ``format[token-hot]`` tokenizes with every value cached
+and ``format[token-cold]`` with none, and the slowest of them relative
+to plain masking is printed.
+
+    python3 redaction_suite.py --save baseline.json
+    python3 redaction_suite.py --baseline baseline.json --threshold 0.1
+
+With ``--baseline`` the exit status is 1 when a case allocates more
+than the baseline by more than the threshold, or is slower by more than
+the threshold or twice the run-to-run spread measured for the case,
+whichever is larger. Each speed is the median of several timing windows
+of at least ``--min-time`` seconds, scaled by a reference loop timed in
+both runs, so a uniformly slower machine does not read as a regression.
+Cases that look slower are measured again up to ``--retries`` times and
+keep their best median, so a burst of load on the machine does not fail
+the run either.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Collection, Dict, List, Tuple
+
+from filtered_logger import (REDACTION_MODES, RedactingFormatter, Tokenizer,
+                             filter_datum)
+
+USER_DATA_COLUMNS = ("name", "email", "phone", "ssn", "password", "ip",
+                     "last_login", "user_agent")
+COLUMN_COUNTS = (8, 32)
+PII_DENSITIES = (0.25, 0.625, 1.0)
+EXTRA_FIELDS = (0, 200)
+TOKEN_KEY = b"redaction-suite"
+# tokenizer cache sizes: unbounded keeps every value hot, 0 computes all
+TOKEN_CACHES = (("token-hot", None), ("token-cold", 0))
+
+
+def columns_for(count: int) -> List[str]:
+    """Returns user_data.csv columns padded with extra ones"""
+    extra = ["extra_{}".format(i) for i in range(count - 8)]
+    return list(USER_DATA_COLUMNS[:count]) + extra
+
+
+def fake_value(rng: random.Random, column: str) -> str:
+    """Returns a value that looks like the user_data.csv column"""
+    if column == "name":
+        return "{} {}".format(rng.choice(["Marlene", "Rhianna", "Bob"]),
+                              rng.choice(["Wood", "Barrera", "Dylan"]))
+    if column == "email":
+        return "user{}@example.com".format(rng.randrange(10 ** 6))
+    if column == "phone":
+        return "({}) {}-{}".format(rng.randrange(100, 1000),
+                                   rng.randrange(100, 1000),
+                                   rng.randrange(1000, 10000))
+    if column == "ssn":
+        return "{}-{}-{}".format(rng.randrange(100, 1000),
+                                 rng.randrange(10, 100),
+                                 rng.randrange(1000, 10000))
+    if column == "ip":
+        return ":".join("{:x}".format(rng.randrange(1 << 16))
+                        for _ in range(8))
+    if column == "last_login":
+        return "2019-11-14 06:{:02d}:{:02d}".format(rng.randrange(60),
+                                                    rng.randrange(60))
+    if column == "user_agent":
+        return ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/"
+                "537.36 (KHTML, like Gecko) Chrome/74.0.3729.157")
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789")
+                   for _ in range(rng.randrange(4, 16)))
+
+
+def build_case(
+    columns: int,
+    density: float,
+    extra_fields: int,
+    records: int,
+    seed: int
+) -> Tuple[List[str], List[str]]:
+    """Returns (fields, messages) for one case, deterministically"""
+    rng = random.Random(seed)
+    names = columns_for(columns)
+    pii = names[:]
+    rng.shuffle(pii)
+    fields = pii[:max(1, round(density * columns))]
+    fields += ["compliance_{}".format(i) for i in range(extra_fields)]
+    messages = [
+        "".join("{}={};".format(name, fake_value(rng, name))
+                for name in names)
+        for _ in range(records)
+    ]
+    return fields, messages
+
+
+def reference_seconds(repeat: int = 5) -> float:
+    """Times a fixed pure-Python workload used to normalize speeds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = 0
+        for i in range(200000):
+            total += len(str(i))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def window_rate(func, messages: List[str], min_time: float) -> float:
+    """Records/s of func over passes on messages lasting min_time"""
+    passes = 0
+    started = time.perf_counter()
+    while True:
+        for message in messages:
+            func(message)
+        passes += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return passes * len(messages) / elapsed
+
+
+def allocations(func, messages: List[str]) -> float:
+    """Mean peak bytes allocated by func per message, over a sample"""
+    sample = messages[:50]
+    tracemalloc.start()
+    peak = 0
+    for message in sample:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        func(message)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return peak / len(sample)
+
+
+def cases(records: int, seed: int) -> List[Tuple[str, object, List[str]]]:
+    """Returns (name, func, messages) for every case"""
+    result = []
+    for columns in COLUMN_COUNTS:
+        for density in PII_DENSITIES:
+            for extra in EXTRA_FIELDS:
+                fields, messages = build_case(columns, density, extra,
+                                              records, seed)
+                case = "cols={},density={},fields={}".format(
+                    columns, density, len(fields))
+                for mode in REDACTION_MODES:
+                    result.append((
+                        "{},filter_datum[{}]".format(case, mode),
+                        lambda m, fields=fields, mode=mode: filter_datum(
+                            fields, "***", m, ";", mode),
+                        messages))
+
+                formatters = [("format", RedactingFormatter(fields))]
+                for name, cache_size in TOKEN_CACHES:
+                    formatters.append(("format[{}]".format(name),
+                                       RedactingFormatter(
+                                           fields, tokenizer=Tokenizer(
+                                               TOKEN_KEY, cache_size))))
+                for name, formatter in formatters:
+                    def format_record(message: str, formatter=formatter):
+                        record = logging.LogRecord(
+                            "user_data", logging.INFO, None, None, message,
+                            None, None)
+                        return formatter.format(record)
+                    result.append(("{},{}".format(case, name), format_record,
+                                   messages))
+    return result
+
+
+def run(
+    records: int,
+    repeat: int,
+    seed: int,
+    min_time: float = 0.1,
+    only: Collection[str] = None
+) -> Dict[str, dict]:
+    """Runs every case, or those named in only, and returns the results
+    keyed by case name
+
+    The timing windows of the cases are interleaved, one round over all
+    the cases per repeat, so that a slow spell of the machine spreads over
+    every case instead of skewing a few of them.
+    """
+    selected = [case for case in cases(records, seed)
+                if only is None or case[0] in only]
+    rates: Dict[str, List[float]] = {name: [] for name, _, _ in selected}
+    for _ in range(repeat):
+        for name, func, messages in selected:
+            rates[name].append(window_rate(func, messages, min_time))
+
+    results = {}
+    for name, func, messages in selected:
+        rate = statistics.median(rates[name])
+        size = sum(map(len, messages))
+        results[name] = {
+            "records_per_sec": rate,
+            "bytes_per_sec": rate * size / len(messages),
+            "spread": (max(rates[name]) - min(rates[name])) / rate,
+            "alloc_bytes_per_record": allocations(func, messages),
+        }
+    return results
+
+
+def regressions(
+    baseline: Dict[str, dict],
+    results: Dict[str, dict],
+    threshold: float,
+    speed_ratio: float = 1.0
+) -> List[Tuple[str, str]]:
+    """Lists the cases that got worse than baseline by over threshold
+
+    ``speed_ratio`` is the current machine speed relative to the one the
+    baseline was recorded on; baseline speeds are scaled by it. Speeds
+    may also drop by twice the larger spread of the two runs, so that
+    noisy cases do not fail on noise. Returns (case, message) pairs.
+    """
+    failures = []
+    for case, old in baseline.items():
+        new = results.get(case)
+        if new is None:
+            continue
+        expected = old["records_per_sec"] * speed_ratio
+        margin = max(threshold, 2 * max(old.get("spread", 0),
+                                        new.get("spread", 0)))
+        if new["records_per_sec"] < expected * (1 - margin):
+            failures.append((case, "{}: {:.0f} -> {:.0f} records/s".format(
+                case, expected, new["records_per_sec"])))
+        if new["alloc_bytes_per_record"] > \
+                old["alloc_bytes_per_record"] * (1 + threshold):
+            failures.append((case, "{}: {:.0f} -> {:.0f} bytes/record"
+                             .format(case, old["alloc_bytes_per_record"],
+                                     new["alloc_bytes_per_record"])))
+    return failures
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Redaction throughput suite")
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.1,
+                        help="seconds of each timing window")
+    parser.add_argument("--save", metavar="PATH",
+                        help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed relative regression (default 0.1)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="new measurements of slower cases")
+    args = parser.parse_args()
+
+    reference = reference_seconds()
+    results = run(args.records, args.repeat, args.seed, args.min_time)
+    reference = statistics.median([reference, reference_seconds()])
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        speed_ratio = baseline["reference_seconds"] / reference
+        for _ in range(args.retries):
+            slower = {case for case, _ in regressions(
+                baseline["results"], results, args.threshold, speed_ratio)}
+            if not slower:
+                break
+            retried = run(args.records, args.repeat, args.seed,
+                          args.min_time, slower)
+            for case, result in retried.items():
+                if result["records_per_sec"] > \
+                        results[case]["records_per_sec"]:
+                    results[case] = result
+
+    print("{:<55} {:>12} {:>10} {:>12}".format(
+        "case", "records/s", "MB/s", "alloc B/rec"))
+    for case, result in results.items():
+        print("{:<55} {:>12.0f} {:>10.2f} {:>12.0f}".format(
+            case, result["records_per_sec"], result["bytes_per_sec"] / 1e6,
+            result["alloc_bytes_per_record"]))
+
+    for name, _ in TOKEN_CACHES:
+        ratios = [results[case.rsplit(",", 1)[0] + ",format"][
+                      "records_per_sec"] / result["records_per_sec"]
+                  for case, result in results.items()
+                  if case.endswith(",format[{}]".format(name))]
+        if ratios:
+            print("{}: at worst {:.2f}x slower than plain masking".format(
+                name, max(ratios)))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "records": args.records,
+                "seed": args.seed,
+                "min_time": args.min_time,
+                "reference_seconds": reference,
+                "results": results,
+            }, f, indent=2)
+
+    if baseline is not None:
+        failures = regressions(baseline["results"], results, args.threshold,
+                               speed_ratio)
+        for _, failure in failures:
+            print("REGRESSION " + failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,14 @@ Route module for the API
 
 import os
 from os import getenv
+from api.v1.json_provider import CodecJSONProvider
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
 
 
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
@@ -27,7 +27,7 @@ class SessionDBAuth(SessionExpAuth):
         """
         if session_id is None:
             return None
-        UserSession.load_from_file()
+        UserSession.refresh()
         sessions = UserSession.search({'session_id': session_id})
         for session in sessions:
             if session.session_id == session_id:
@@ -44,7 +44,7 @@ class SessionDBAuth(SessionExpAuth):
         if session_id is None:
             return False
 
-        UserSession.load_from_file()
+        UserSession.refresh()
         sessions = UserSession.search({'session_id': session_id})
         if not sessions:
             return False
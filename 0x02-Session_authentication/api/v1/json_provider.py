@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+JSON provider module for the API
+"""
+from flask.json.provider import DefaultJSONProvider
+
+from models import codec
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """ Flask JSON provider encoding with models.codec
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        """ Encode obj to a JSON string
+        """
+        return codec.dumps(obj, sort_keys=kwargs.get("sort_keys",
+                                                     self.sort_keys),
+                           indent=kwargs.get("indent")).decode()
+
+    def loads(self, s, **kwargs):
+        """ Decode a JSON string or bytes
+        """
+        return codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        """ JSON response of the arguments, as jsonify() returns
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = None
+        if (self.compact is None and self._app.debug) or \
+                self.compact is False:
+            indent = 2
+        data = codec.dumps(obj, sort_keys=self.sort_keys, indent=indent)
+        return self._app.response_class(data + b"\n",
+                                        mimetype=self.mimetype)
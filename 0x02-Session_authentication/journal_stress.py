@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+""" Journal stress test
+
+Saves sessions with STORAGE_TYPE=journal and a small JOURNAL_MAX_SIZE,
+reloading the class after each save so that reloads interleave with the
+background compactions, then checks that no session was lost, both in
+this process and from the files once compaction is done. Torn lines, as
+left by a process that crashed mid-append, are written to the journal
+along the way; the saves that follow them must not be lost either.
+
+    python3 journal_stress.py --sessions 3000 --max-size 20000 --torn 5
+
+Exits with status 1 when sessions are missing.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Journal stress test")
+    parser.add_argument("--sessions", type=int, default=3000)
+    parser.add_argument("--max-size", type=int, default=20000,
+                        help="JOURNAL_MAX_SIZE in bytes")
+    parser.add_argument("--torn", type=int, default=5,
+                        help="torn lines written to the journal")
+    args = parser.parse_args()
+
+    os.environ["STORAGE_TYPE"] = "journal"
+    os.environ["JOURNAL_MAX_SIZE"] = str(args.max_size)
+    os.chdir(tempfile.mkdtemp())
+    from models.journal import get_journal
+    from models.user_session import UserSession
+    UserSession.load_from_file()
+    journal = get_journal(UserSession.__name__)
+    torn_every = args.sessions // (args.torn + 1) if args.torn else 0
+
+    started = time.perf_counter()
+    for i in range(args.sessions):
+        if torn_every and i % torn_every == torn_every - 1:
+            with journal.lock:
+                with open(journal.path, 'ab') as f:
+                    f.write(b'{"id": "torn-')
+        session = UserSession(user_id="user-{}".format(i),
+                              session_id="session-{}".format(i))
+        session.save()
+        UserSession.load_from_file()
+    elapsed = time.perf_counter() - started
+
+    while journal.compacting:
+        time.sleep(0.01)
+    missing = {}
+    for phase in ("memory", "files"):
+        if phase == "files":
+            UserSession.load_from_file()
+        missing[phase] = [
+            i for i in range(args.sessions)
+            if not UserSession.search({"session_id": "session-{}".format(i)})
+        ]
+    print("{} saves with reloads in {:.2f} s ({:.0f} saves/s)".format(
+        args.sessions, elapsed, args.sessions / elapsed))
+    print("stored {}, missing {} in memory, {} from the files".format(
+        UserSession.count(), len(missing["memory"]), len(missing["files"])))
+    if any(missing.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+""" Memory benchmark
+
+Bytes held per user by the eager object store (User objects in a dict
+plus their index) and by the compact store (models.column_store), both
+built from the same generated records, and the peak bytes per user
+allocated while save_to_file() writes each store to a JSON file.
+
+    python3 memory_benchmark.py --users 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from models import base, codec
+from models.codec import TIMESTAMP_FORMAT
+from models.column_store import ColumnRecords
+from models.lazy_store import LazyStore
+from models.user import User
+
+FIRST_NAMES = ("Bob", "Marlene", "Rhianna", "Alice", "John", None)
+LAST_NAMES = ("Dylan", "Wood", "Barrera", "Smith", None)
+
+
+def make_records(count: int) -> dict:
+    """ Records of count users as load_from_file() reads them, decoded
+    from JSON so that equal strings are distinct objects
+    """
+    rng = random.Random(0)
+    started = datetime(2024, 1, 1)
+    records = {}
+    for i in range(count):
+        obj_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        stamp = (started + timedelta(seconds=i * 37)).strftime(
+            TIMESTAMP_FORMAT)
+        records[obj_id] = {
+            "id": obj_id, "created_at": stamp, "updated_at": stamp,
+            "email": "user{}@example.com".format(i),
+            "_password": "{:064x}".format(rng.getrandbits(256)),
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+        }
+    return codec.loads(codec.dumps(records))
+
+
+def eager(records: dict):
+    """ Store as load_from_file() builds it by default
+    """
+    base.DATA["User"] = {}
+    for obj_id in list(records):
+        base.DATA["User"][obj_id] = User(**records.pop(obj_id))
+    User._reindex()
+    return base.DATA["User"], base.INDEXES["User"]
+
+
+def compact(records: dict):
+    """ Store as load_from_file() builds it with OBJECT_STORE=compact
+    """
+    columns = ColumnRecords.from_records(records, User.indexed_attributes)
+    base.DATA["User"] = LazyStore(User, lambda: columns)
+    return columns
+
+
+def measure(build, count: int):
+    """ Bytes per user held by the store build returns, records
+    included, seconds taken by build without tracing, and peak bytes per
+    user allocated while the store is saved
+    """
+    records = make_records(count)
+    started = time.perf_counter()
+    store = build(records)
+    elapsed = time.perf_counter() - started
+    del records, store
+    base.DATA.clear()
+    base.INDEXES.clear()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(make_records(count))
+    held = tracemalloc.get_traced_memory()[0] - before
+
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        User.save_to_file()
+        saving = tracemalloc.get_traced_memory()[1] - before
+        os.remove(".db_User.json")
+    finally:
+        os.chdir(cwd)
+    tracemalloc.stop()
+    del store
+    base.DATA.clear()
+    base.INDEXES.clear()
+    return held / count, elapsed, saving / count
+
+
+def main():
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Store memory benchmark")
+    parser.add_argument("--users", type=int, default=1000000)
+    args = parser.parse_args()
+
+    results = {}
+    print("{:<8} {:>12} {:>10} {:>14}".format("store", "bytes/user",
+                                              "build s", "save peak B/u"))
+    for name, build in (("eager", eager), ("compact", compact)):
+        results[name], elapsed, saving = measure(build, args.users)
+        print("{:<8} {:>12.0f} {:>10.2f} {:>14.0f}".format(
+            name, results[name], elapsed, saving))
+    print("ratio {:.1f}x".format(results["eager"] / results["compact"]))
+
+if __name__ == "__main__":
+    main()
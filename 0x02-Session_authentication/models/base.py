@@ -2,36 +2,134 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Tuple
+from os import getenv, path
+import os
 import uuid
 
+from models import codec, group_commit
+from models.codec import TIMESTAMP_FORMAT, format_timestamp, \
+    parse_timestamp
+from models.column_store import ColumnRecords
+from models.file_state import get_file_state
+from models.journal import get_journal
+from models.lazy_store import OBJECT_STORE, LazyStore
+from models.sqlite_store import SQLiteRecords, get_records
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+STORAGE_TYPE = getenv("STORAGE_TYPE", "json")
 DATA = {}
+INDEXES = {}
+
+
+class AttributeIndex():
+    """ Hash index of object ids by attribute value
+    """
+
+    def __init__(self, attributes: Tuple[str, ...]):
+        """ Initialize an empty index over attributes
+        """
+        self.attributes = attributes
+        self.ids = {attribute: {} for attribute in attributes}
+        self.unhashable = {attribute: {} for attribute in attributes}
+        self.values = {}
+
+    def add(self, obj_id: str, values: tuple):
+        """ Index obj_id under its attribute values
+        """
+        if self.values.get(obj_id) == values:
+            return
+        self.discard(obj_id)
+        self.values[obj_id] = values
+        for attribute, value in zip(self.attributes, values):
+            try:
+                self.ids[attribute].setdefault(value, {})[obj_id] = None
+            except TypeError:
+                self.unhashable[attribute][obj_id] = None
+
+    def discard(self, obj_id: str):
+        """ Remove obj_id from the index
+        """
+        values = self.values.pop(obj_id, None)
+        if values is None:
+            return
+        for attribute, value in zip(self.attributes, values):
+            unhashable = self.unhashable[attribute]
+            if obj_id in unhashable:
+                del unhashable[obj_id]
+                continue
+            bucket = self.ids[attribute][value]
+            del bucket[obj_id]
+            if not bucket:
+                del self.ids[attribute][value]
+
+    def lookup(self, attribute: str, value) -> List[str]:
+        """ Ids that may hold value for attribute
+        Objects with unhashable values are always returned as candidates
+        """
+        candidates = list(self.unhashable[attribute])
+        try:
+            candidates.extend(self.ids[attribute].get(value, ()))
+        except TypeError:
+            return list(self.values)
+        return candidates
 
 
 class Base():
     """ Base class
+    Subclasses list in indexed_attributes the attributes that search()
+    should find through a hash index instead of a full scan. Indexes
+    follow save(), remove() and load_from_file(): an indexed attribute
+    changed on a stored object is found under its new value once the
+    object is saved again.
+
+    With STORAGE_TYPE=journal, save() and remove() append one record to
+    ``.db_<Class>.journal`` instead of rewriting ``.db_<Class>.json``
+    (see models.journal); the JSON file stays the snapshot it replays.
+    With GROUP_COMMIT_INTERVAL set, the JSON file is instead rewritten
+    at most once per interval or GROUP_COMMIT_SIZE changes (see
+    models.group_commit); flush() writes pending changes at once.
+
+    Files are encoded with models.codec, which writes the datetime
+    attributes itself, so saving does not go through to_json().
+
+    With OBJECT_STORE=lazy, load_from_file() does not build any object:
+    DATA holds a LazyStore that reads the file on first access and builds
+    objects as they are looked up (see models.lazy_store). With
+    OBJECT_STORE=compact, the records themselves are stored as packed
+    columns that also serve as the index (see models.column_store).
+
+    With the default JSON storage, several processes can share the
+    files: save() and remove() lock the file and first reload the class
+    if another process wrote it, and reads reload it on such a change
+    (see models.file_state).
+
+    With STORAGE_TYPE=sqlite, each class is a table of SQLITE_PATH (see
+    models.sqlite_store): save() and remove() are transactions, and
+    get(), count() and indexed searches are queries. Objects are built
+    from their rows on each lookup, never cached, so that changes and
+    removals by other processes are seen at once.
     """
 
+    indexed_attributes: Tuple[str, ...] = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            DATA[s_class] = self.__class__._new_store()
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        if 'id' in kwargs:
+            self.id = kwargs['id']
+        else:
+            self.id = str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -52,7 +150,7 @@ class Base():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = format_timestamp(value)
             else:
                 result[key] = value
         return result
@@ -60,51 +158,184 @@ class Base():
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
+        Changes held back by group commit are written first, not dropped
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        if STORAGE_TYPE == "sqlite":
+            DATA[s_class] = cls._new_store()
+            INDEXES.pop(s_class, None)
+            return
+        cls.flush()
+        if OBJECT_STORE == "lazy":
+            DATA[s_class] = LazyStore(cls, cls._read_records)
+            INDEXES.pop(s_class, None)
+            return
+        if OBJECT_STORE == "compact":
+            DATA[s_class] = LazyStore(cls, lambda: ColumnRecords.from_records(
+                cls._read_records(), cls.indexed_attributes))
+            INDEXES.pop(s_class, None)
             return
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        # built aside so that DATA never holds a partly loaded class
+        objs = {}
+        for obj_id, obj_json in cls._read_records().items():
+            objs[obj_id] = cls(**obj_json)
+        DATA[s_class] = objs
+        cls._reindex()
 
     @classmethod
-    def save_to_file(cls):
-        """ Save all objects to file
+    def _new_store(cls):
+        """ Empty store of the class for DATA
+        """
+        if STORAGE_TYPE == "sqlite":
+            # a cached object would outlive changes by other processes
+            return LazyStore(cls, lambda: get_records(
+                cls.__name__, cls.indexed_attributes), cache_size=0)
+        return {}
+
+    @classmethod
+    def _read_records(cls) -> dict:
+        """ Stored records of the class by id
         """
         s_class = cls.__name__
+        if STORAGE_TYPE == "journal":
+            return get_journal(s_class).read()
         file_path = ".db_{}.json".format(s_class)
         objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        state = get_file_state(s_class)
+        with state.locked(exclusive=False):
+            if path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    objs_json = codec.loads(f.read())
+            state.synced()
+        return objs_json
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def save_to_file(cls, sync: bool = False):
+        """ Save all objects to file
+        sync waits for the data to reach the disk
+        """
+        if STORAGE_TYPE == "sqlite":
+            # rows are written by save() and remove()
+            return
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        objs = DATA[s_class]
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            if isinstance(objs, LazyStore):
+                # streamed: compact records are never all built at once
+                codec.dump_items(f, objs.serialized())
+            else:
+                objs_json = {}
+                for obj_id, obj in list(objs.items()):
+                    objs_json[obj_id] = obj.__dict__
+                f.write(codec.dumps(objs_json))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
 
-    def save(self):
+    @classmethod
+    def _persist(cls, obj_id: str, obj: TypeVar('Base') = None,
+                 durable: bool = None):
+        """ Write the change of one object (None when removed)
+        """
+        if STORAGE_TYPE == "sqlite":
+            # the row was written when the object was stored in DATA
+            return
+        if STORAGE_TYPE == "journal":
+            get_journal(cls.__name__).append(
+                obj_id, obj.__dict__ if obj is not None else None)
+        elif group_commit.GROUP_COMMIT_INTERVAL > 0:
+            if durable is None:
+                durable = group_commit.GROUP_COMMIT_DURABLE
+            group_commit.get_committer().mark(cls, wait=durable)
+        else:
+            state = get_file_state(cls.__name__)
+            with state.locked():
+                if state.changed():
+                    cls._merge(obj_id, obj)
+                cls.save_to_file()
+                state.written()
+
+    @classmethod
+    def _merge(cls, obj_id: str, obj: TypeVar('Base') = None):
+        """ Reload the class from its file, then apply again the change of
+        one object (None when removed)
+        """
+        s_class = cls.__name__
+        cls.load_from_file()
+        if obj is not None:
+            DATA[s_class][obj_id] = obj
+            cls._index().add(obj_id, obj._indexed_values())
+        elif obj_id in DATA[s_class]:
+            del DATA[s_class][obj_id]
+            cls._index().discard(obj_id)
+
+    @classmethod
+    def _shares_file(cls) -> bool:
+        """ Whether the class file is shared with other processes
+        """
+        return STORAGE_TYPE == "json" and \
+            group_commit.GROUP_COMMIT_INTERVAL <= 0
+
+    @classmethod
+    def _file_changed(cls) -> bool:
+        """ Whether another process wrote the class file since this one
+        read it
+        """
+        if not cls._shares_file():
+            return False
+        objs = DATA.get(cls.__name__)
+        if isinstance(objs, LazyStore) and objs._records is None:
+            # nothing read yet
+            return False
+        return get_file_state(cls.__name__).changed()
+
+    @classmethod
+    def refresh(cls):
+        """ Bring the objects of the class up to date with the storage
+        The JSON file is reloaded only if another process changed it; the
+        journal has a single writing process and SQLite objects are never
+        cached, so there is nothing to do for them
+        """
+        if cls._shares_file() and cls._file_changed():
+            cls.load_from_file()
+
+    @classmethod
+    def flush(cls):
+        """ Write the changes held back by group commit
+        """
+        if group_commit.GROUP_COMMIT_INTERVAL > 0:
+            group_commit.get_committer().flush()
+
+    def save(self, durable: bool = None):
         """ Save current object
+        durable waits until a group commit has written it to disk
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
         DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__._index().add(self.id, self._indexed_values())
+        self.__class__._persist(self.id, self, durable)
 
-    def remove(self):
+    def remove(self, durable: bool = None):
         """ Remove object
+        durable waits until a group commit has written it to disk
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        if self.id in DATA[s_class]:
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            self.__class__._index().discard(self.id)
+            self.__class__._persist(self.id, durable=durable)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        if cls._file_changed():
+            cls.load_from_file()
         s_class = cls.__name__
         return len(DATA[s_class].keys())
 
@@ -118,13 +349,18 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        if cls._file_changed():
+            cls.load_from_file()
         s_class = cls.__name__
         return DATA[s_class].get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        Uses the index of the first indexed attribute of the query
         """
+        if cls._file_changed():
+            cls.load_from_file()
         s_class = cls.__name__
 
         def _search(obj):
@@ -135,4 +371,46 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        objs = DATA[s_class]
+        for k, v in attributes.items():
+            if k in cls.indexed_attributes:
+                candidates = (objs.get(obj_id)
+                              for obj_id in cls._index().lookup(k, v))
+                return [obj for obj in candidates
+                        if obj is not None and _search(obj)]
+        return list(filter(_search, objs.values()))
+
+    def _indexed_values(self) -> tuple:
+        """ Values of the indexed attributes of the object
+        """
+        return tuple(getattr(self, attribute, None)
+                     for attribute in self.indexed_attributes)
+
+    @classmethod
+    def _index(cls) -> AttributeIndex:
+        """ Index of the class, built on first use
+        """
+        s_class = cls.__name__
+        if s_class not in INDEXES:
+            cls._reindex()
+        return INDEXES[s_class]
+
+    @classmethod
+    def _reindex(cls):
+        """ Rebuild the index of the class from DATA
+        """
+        s_class = cls.__name__
+        index = AttributeIndex(cls.indexed_attributes)
+        objs = DATA.get(s_class, {})
+        if isinstance(objs, LazyStore) and \
+                isinstance(objs.records, (ColumnRecords, SQLiteRecords)):
+            INDEXES[s_class] = objs.records
+            return
+        if isinstance(objs, LazyStore):
+            for obj_id in objs:
+                index.add(obj_id, objs.indexed_values(
+                    obj_id, cls.indexed_attributes))
+        else:
+            for obj_id, obj in objs.items():
+                index.add(obj_id, obj._indexed_values())
+        INDEXES[s_class] = index
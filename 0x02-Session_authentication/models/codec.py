@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+""" Codec module
+"""
+from datetime import datetime
+from functools import lru_cache
+from os import getenv
+from typing import Iterable, Tuple
+import json
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+JSON_CODEC = getenv("JSON_CODEC", "auto")
+CODECS = ("orjson", "ujson", "json")
+TIMESTAMP_CACHE_SIZE = 65536
+DUMP_CHUNK_SIZE = 1000
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Datetime of a TIMESTAMP_FORMAT string
+    Only strings shaped like TIMESTAMP_FORMAT take the fromisoformat()
+    path, which accepts other ISO forms too; the rest go through
+    strptime(), which raises ValueError as before.
+    """
+    if len(value) == 19 and value[4] == "-" and value[7] == "-" and \
+            value[10] == "T" and value[13] == ":" and value[16] == ":":
+        try:
+            result = datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            if result.tzinfo is None:
+                return result
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def format_timestamp(value: datetime) -> str:
+    """ TIMESTAMP_FORMAT string of a datetime
+    Objects are saved and returned by the API many times with the same
+    timestamps, hence the cache.
+    """
+    if value.tzinfo is None and value.year >= 1000:
+        return value.isoformat(timespec="seconds")
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _default(value):
+    """ Encode the values the JSON libraries do not know
+    """
+    if isinstance(value, datetime):
+        return format_timestamp(value)
+    raise TypeError("Object of type {} is not JSON serializable".format(
+        type(value).__name__))
+
+
+class Codec():
+    """ JSON encoder and decoder backed by the fastest library available
+
+    dumps() returns bytes and encodes datetimes natively as
+    TIMESTAMP_FORMAT strings, so model attributes can be written without
+    formatting them first. loads() accepts bytes or str.
+    """
+
+    def __init__(self, name: str = "auto"):
+        """ Initialize the codec for library name, or the first installed
+        of CODECS for "auto"
+        """
+        names = CODECS if name == "auto" else (name,)
+        for candidate in names:
+            if candidate not in CODECS:
+                raise ValueError("unknown JSON codec: {}".format(candidate))
+            try:
+                self.module = __import__(candidate)
+            except ImportError:
+                if name != "auto":
+                    raise
+                continue
+            self.name = candidate
+            break
+        self.dumps = getattr(self, "_dumps_" + self.name)
+        self.loads = self.module.loads
+
+    def _dumps_orjson(self, obj, sort_keys: bool = False,
+                      indent: int = None) -> bytes:
+        """ Encode obj with orjson
+        """
+        option = self.module.OPT_OMIT_MICROSECONDS
+        if sort_keys:
+            option |= self.module.OPT_SORT_KEYS
+        if indent:
+            option |= self.module.OPT_INDENT_2
+        return self.module.dumps(obj, default=_default, option=option)
+
+    def _dumps_ujson(self, obj, sort_keys: bool = False,
+                     indent: int = None) -> bytes:
+        """ Encode obj with ujson
+        """
+        return self.module.dumps(obj, default=_default, sort_keys=sort_keys,
+                                 indent=indent or 0,
+                                 ensure_ascii=False).encode()
+
+    def _dumps_json(self, obj, sort_keys: bool = False,
+                    indent: int = None) -> bytes:
+        """ Encode obj with the standard library
+        """
+        return json.dumps(obj, default=_default, sort_keys=sort_keys,
+                          indent=indent, ensure_ascii=False).encode()
+
+
+_codec = None
+
+
+def get_codec() -> Codec:
+    """ Codec configured by JSON_CODEC
+    """
+    global _codec
+    if _codec is None:
+        _codec = Codec(JSON_CODEC)
+    return _codec
+
+
+def dumps(obj, sort_keys: bool = False, indent: int = None) -> bytes:
+    """ Encode obj to JSON bytes
+    """
+    return get_codec().dumps(obj, sort_keys=sort_keys, indent=indent)
+
+
+def dump_items(f, items: Iterable[Tuple[str, object]],
+               chunk_size: int = DUMP_CHUNK_SIZE):
+    """ Write the (key, value) pairs of items to binary file f as one JSON
+    object, encoding chunk_size pairs at a time so that no dict of all
+    the pairs is built
+    """
+    f.write(b"{")
+    separator = b""
+    chunk = {}
+    for key, value in items:
+        chunk[key] = value
+        if len(chunk) == chunk_size:
+            f.write(separator + dumps(chunk)[1:-1])
+            separator = b","
+            chunk = {}
+    if chunk:
+        f.write(separator + dumps(chunk)[1:-1])
+    f.write(b"}")
+
+
+def loads(data):
+    """ Decode JSON bytes or str
+    """
+    return get_codec().loads(data)
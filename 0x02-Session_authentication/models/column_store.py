@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+""" Column store module
+"""
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Tuple
+
+from models.codec import format_timestamp, parse_timestamp
+
+
+MISSING = object()
+EMPTY = -1
+DELETED = -2
+SHARE_SAMPLE = 1024
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds=1)
+# packed timestamps are mostly distinct: skip the cache of format_timestamp
+_format_timestamp = format_timestamp.__wrapped__
+
+
+class ObjectColumn():
+    """ Column of any values, equal strings stored once while they repeat
+    """
+
+    def __init__(self, values: list = None):
+        """ Initialize the column with values
+        """
+        self.values = values if values is not None else []
+        self.shared = {}
+        self.writes = 0
+
+    def grow(self, size: int):
+        """ Add missing rows up to size
+        """
+        self.values.extend([MISSING] * (size - len(self.values)))
+
+    def set(self, row: int, value) -> bool:
+        """ Store value in row
+        """
+        if self.shared is not None and type(value) is str:
+            value = self.shared.setdefault(value, value)
+            self.writes += 1
+            if self.writes == SHARE_SAMPLE and \
+                    len(self.shared) > SHARE_SAMPLE // 2:
+                # mostly distinct values: the table costs more than it saves
+                self.shared = None
+        self.values[row] = value
+        return True
+
+    def get(self, row: int):
+        """ Value of row
+        """
+        return self.values[row]
+
+    def matcher(self, value) -> Callable[[int], bool]:
+        """ Test of whether a row holds value, missing counting as None
+        """
+        values = self.values
+
+        def match(row: int) -> bool:
+            stored = values[row]
+            return (None if stored is MISSING else stored) == value
+        return match
+
+    def clear(self, row: int):
+        """ Mark row as missing
+        """
+        self.values[row] = MISSING
+
+
+class PackedColumn():
+    """ Column of values encoded to width bytes each in one bytearray
+    None and missing values are kept aside in a dict
+    """
+
+    def __init__(self, width: int, encode: Callable, decode: Callable):
+        """ Initialize an empty column
+        encode returns the bytes of a value, or None if it does not fit
+        """
+        self.width = width
+        self.encode = encode
+        self.decode = decode
+        self.data = bytearray()
+        self.absent = {}
+
+    def grow(self, size: int):
+        """ Add missing rows up to size
+        """
+        rows = len(self.data) // self.width
+        if rows < size:
+            self.absent.update(dict.fromkeys(range(rows, size), MISSING))
+            self.data.extend(bytes((size - rows) * self.width))
+
+    def set(self, row: int, value) -> bool:
+        """ Store value in row, False if it does not fit the packing
+        """
+        if value is None or value is MISSING:
+            self.absent[row] = value
+            return True
+        data = self.encode(value)
+        if data is None:
+            return False
+        self.absent.pop(row, None)
+        start = row * self.width
+        self.data[start:start + self.width] = data
+        return True
+
+    def get(self, row: int):
+        """ Value of row
+        """
+        if row in self.absent:
+            return self.absent[row]
+        start = row * self.width
+        return self.decode(bytes(self.data[start:start + self.width]))
+
+    def matcher(self, value) -> Callable[[int], bool]:
+        """ Test of whether a row holds value, missing counting as None
+        Compares the packed bytes, so rows are not decoded
+        """
+        absent = self.absent
+        data = self.data
+        width = self.width
+        key = None if value is None else self.encode(value)
+
+        def match(row: int) -> bool:
+            if row in absent:
+                return value is None
+            start = row * width
+            return key is not None and data[start:start + width] == key
+        return match
+
+    def clear(self, row: int):
+        """ Mark row as missing
+        """
+        self.absent[row] = MISSING
+
+
+def _decode_uuid(data: bytes) -> str:
+    """ UUID string of 16 bytes
+    """
+    digits = data.hex()
+    return "{}-{}-{}-{}-{}".format(digits[:8], digits[8:12], digits[12:16],
+                                   digits[16:20], digits[20:])
+
+
+def _encode_uuid(value) -> bytes:
+    """ 16 bytes of a lowercase UUID string
+    """
+    if type(value) is not str or len(value) != 36:
+        return None
+    try:
+        data = bytes.fromhex(value.replace("-", ""))
+    except ValueError:
+        return None
+    if len(data) != 16 or _decode_uuid(data) != value:
+        return None
+    return data
+
+
+def _encode_digest(value) -> bytes:
+    """ 32 bytes of a lowercase SHA256 hex digest
+    """
+    if type(value) is not str or len(value) != 64:
+        return None
+    try:
+        data = bytes.fromhex(value)
+    except ValueError:
+        return None
+    return data if data.hex() == value else None
+
+
+def _encode_timestamp(value) -> bytes:
+    """ 8 bytes of the seconds since 1970 of a timestamp string
+    """
+    if type(value) is not str:
+        return None
+    try:
+        stamp = parse_timestamp(value)
+    except ValueError:
+        return None
+    if _format_timestamp(stamp) != value:
+        return None
+    return ((stamp - EPOCH) // SECOND).to_bytes(8, "little", signed=True)
+
+
+def _decode_timestamp(data: bytes) -> str:
+    """ Timestamp string of 8 bytes
+    """
+    seconds = int.from_bytes(data, "little", signed=True)
+    return _format_timestamp(EPOCH + timedelta(seconds=seconds))
+
+
+COLUMN_TYPES = (
+    (16, _encode_uuid, _decode_uuid),
+    (32, _encode_digest, bytes.hex),
+    (8, _encode_timestamp, _decode_timestamp),
+)
+
+
+def new_column(value):
+    """ Column suited to value
+    """
+    for width, encode, decode in COLUMN_TYPES:
+        if value is not None and encode(value) is not None:
+            return PackedColumn(width, encode, decode)
+    return ObjectColumn()
+
+
+def _hash(value) -> int:
+    """ Hash of value, 0 for unhashable values
+    """
+    try:
+        return hash(value)
+    except TypeError:
+        return 0
+
+
+class RowTable():
+    """ Open addressing hash table of rows by the value of one column
+    Slots hold row numbers only; values are read back from the column.
+    """
+
+    def __init__(self, records: 'ColumnRecords', name: str):
+        """ Initialize an empty table over column name of records
+        """
+        self.records = records
+        self.name = name
+        self.slots = array('i', [EMPTY]) * 8
+        self.used = 0
+        self.count = 0
+
+    def add(self, row: int, value):
+        """ Add row, whose value is value
+        """
+        if (self.used + 1) * 2 > len(self.slots):
+            self._resize()
+        mask = len(self.slots) - 1
+        i = _hash(value) & mask
+        while self.slots[i] >= 0:
+            i = (i + 1) & mask
+        if self.slots[i] == EMPTY:
+            self.used += 1
+        self.slots[i] = row
+        self.count += 1
+
+    def remove(self, row: int, value):
+        """ Remove row, whose value is value
+        """
+        mask = len(self.slots) - 1
+        i = _hash(value) & mask
+        while self.slots[i] != EMPTY:
+            if self.slots[i] == row:
+                self.slots[i] = DELETED
+                self.count -= 1
+                return
+            i = (i + 1) & mask
+
+    def find(self, value) -> List[int]:
+        """ Rows whose value equals value
+        While no record has the attribute, every live row holds None
+        """
+        column = self.records.columns.get(self.name)
+        if column is None:
+            if value is not None:
+                return []
+            live = self.records.live
+            return [row for row in range(len(live)) if live[row]]
+        match = column.matcher(value)
+        rows = []
+        slots = self.slots
+        mask = len(slots) - 1
+        i = _hash(value) & mask
+        while slots[i] != EMPTY:
+            row = slots[i]
+            if row >= 0 and match(row):
+                rows.append(row)
+            i = (i + 1) & mask
+        return rows
+
+    def _resize(self):
+        """ Rebuild the table at four times the live rows
+        """
+        rows = [row for row in self.slots if row >= 0]
+        size = 8
+        while size < len(rows) * 4:
+            size *= 2
+        self.slots = array('i', [EMPTY]) * size
+        self.used = 0
+        self.count = 0
+        for row in rows:
+            self.add(row, self.records.value(row, self.name))
+
+
+class ColumnRecords(MutableMapping):
+    """ Records by id, stored as columns
+
+    Each record attribute is one column. UUIDs, SHA256 hex digests and
+    timestamps are packed into bytes, other values are kept in lists with
+    repeated strings shared. A column falls back to a list as soon as a
+    value does not fit its packing. Ids and the indexed attributes have a
+    RowTable, which also makes this mapping the index of its model class.
+    """
+
+    def __init__(self, indexed: Tuple[str, ...] = ()):
+        """ Initialize an empty mapping with tables for indexed
+        """
+        self.columns = {}
+        self.size = 0
+        self.free = []
+        self.live = bytearray()
+        self.tables = {name: RowTable(self, name)
+                       for name in ("id",) + tuple(indexed)}
+
+    @classmethod
+    def from_records(cls, records: dict,
+                     indexed: Tuple[str, ...] = ()) -> 'ColumnRecords':
+        """ Mapping of records, which is emptied along the way
+        """
+        result = cls(indexed)
+        for obj_id in list(records):
+            result._insert(obj_id, records.pop(obj_id))
+        return result
+
+    def value(self, row: int, name: str):
+        """ Value of attribute name in row, None if missing
+        """
+        column = self.columns.get(name)
+        if column is None:
+            return None
+        value = column.get(row)
+        return None if value is MISSING else value
+
+    def _row(self, obj_id: str) -> int:
+        """ Row of obj_id, -1 if not stored
+        """
+        rows = self.tables["id"].find(obj_id)
+        return rows[0] if rows else -1
+
+    def _set(self, row: int, name: str, value):
+        """ Store value of attribute name in row
+        """
+        column = self.columns.get(name)
+        if column is None:
+            column = new_column(value)
+            column.grow(self.size)
+            self.columns[name] = column
+        if not column.set(row, value):
+            values = [column.get(i) for i in range(self.size)]
+            column = ObjectColumn(values)
+            self.columns[name] = column
+            column.set(row, value)
+
+    def __getitem__(self, obj_id: str) -> dict:
+        """ Record of obj_id
+        """
+        row = self._row(obj_id)
+        if row < 0:
+            raise KeyError(obj_id)
+        return self._record(row)
+
+    def _record(self, row: int) -> dict:
+        """ Record stored in row
+        """
+        record = {}
+        for name, column in self.columns.items():
+            value = column.get(row)
+            if value is not MISSING:
+                record[name] = value
+        return record
+
+    def __setitem__(self, obj_id: str, record: dict):
+        """ Store record for obj_id
+        """
+        row = self._row(obj_id)
+        if row < 0:
+            self._insert(obj_id, record)
+            return
+        for name, table in self.tables.items():
+            if name != "id":
+                table.remove(row, self.value(row, name))
+        self._write(row, record)
+
+    def _insert(self, obj_id: str, record: dict):
+        """ Store the record of obj_id, which is not stored yet
+        """
+        if self.free:
+            row = self.free.pop()
+            self.live[row] = 1
+        else:
+            row = self.size
+            self.size += 1
+            self.live.append(1)
+            for column in self.columns.values():
+                column.grow(self.size)
+        self._set(row, "id", obj_id)
+        self.tables["id"].add(row, obj_id)
+        self._write(row, record)
+
+    def _write(self, row: int, record: dict):
+        """ Store the attributes of record in row and index them
+        """
+        if not self.columns.keys() <= record.keys():
+            for name, column in self.columns.items():
+                if name != "id" and name not in record:
+                    column.clear(row)
+        for name, value in record.items():
+            if name != "id":
+                self._set(row, name, value)
+        for name, table in self.tables.items():
+            if name != "id":
+                table.add(row, self.value(row, name))
+
+    def __delitem__(self, obj_id: str):
+        """ Remove the record of obj_id
+        """
+        row = self._row(obj_id)
+        if row < 0:
+            raise KeyError(obj_id)
+        for name, table in self.tables.items():
+            table.remove(row, self.value(row, name))
+        for column in self.columns.values():
+            column.clear(row)
+        self.live[row] = 0
+        self.free.append(row)
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Whether obj_id is stored
+        """
+        return self._row(obj_id) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the stored ids
+        """
+        column = self.columns.get("id")
+        for row in range(self.size):
+            if self.live[row]:
+                yield column.get(row)
+
+    def __len__(self) -> int:
+        """ Number of stored records
+        """
+        return self.size - len(self.free)
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        """ (id, record) pairs, each record built when it is reached
+        """
+        ids = self.columns.get("id")
+        for row in range(self.size):
+            if self.live[row]:
+                yield ids.get(row), self._record(row)
+
+    def add(self, obj_id: str, values: tuple):
+        """ Nothing to do: tables follow the stored records
+        """
+
+    def discard(self, obj_id: str):
+        """ Nothing to do: tables follow the stored records
+        """
+
+    def lookup(self, attribute: str, value) -> List[str]:
+        """ Ids whose attribute equals value
+        """
+        return [self.value(row, "id")
+                for row in self.tables[attribute].find(value)]
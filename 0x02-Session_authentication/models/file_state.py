@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+""" File state module
+"""
+from contextlib import contextmanager
+import fcntl
+import os
+import struct
+import threading
+
+
+FILE_STATES = {}
+
+
+class FileState():
+    """ Lock and change stamp of the JSON file of one model class
+
+    Processes writing ``.db_<Class>.json`` hold an exclusive flock on
+    ``.db_<Class>.json.lock`` and increment the generation counter kept in
+    its first 8 bytes. A process records the generation and the mtime,
+    size and inode of the file when it reads or writes it; the file was
+    changed by someone else when they no longer match.
+    """
+
+    def __init__(self, name: str):
+        """ Initialize the state of model class name
+        """
+        self.path = ".db_{}.json".format(name)
+        self.lock_path = self.path + ".lock"
+        self.fd = None
+        self.pid = None
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.stamp = None
+
+    def _fd(self) -> int:
+        """ Descriptor of the lock file, opened on first use in each process
+        A forked child must not share the descriptor of its parent: flock
+        locks belong to the open file, so they would not exclude each other
+        """
+        if self.pid != os.getpid():
+            self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self.pid = os.getpid()
+        return self.fd
+
+    @contextmanager
+    def locked(self, exclusive: bool = True):
+        """ Hold the file lock, shared or exclusive
+        Nested uses keep the lock taken by the outermost one
+        """
+        with self.thread_lock:
+            if self.depth == 0:
+                fcntl.flock(self._fd(),
+                            fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+                if self.depth == 0:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def generation(self) -> int:
+        """ Number of writes recorded in the lock file
+        """
+        data = os.pread(self._fd(), 8, 0)
+        return struct.unpack("<Q", data)[0] if len(data) == 8 else 0
+
+    def current(self) -> tuple:
+        """ Stamp of the file as it is now
+        """
+        try:
+            st = os.stat(self.path)
+            file_stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            file_stamp = None
+        return (self.generation(), file_stamp)
+
+    def changed(self) -> bool:
+        """ Whether the file changed since it was last read or written
+        """
+        return self.current() != self.stamp
+
+    def synced(self):
+        """ Record that the file was read
+        """
+        self.stamp = self.current()
+
+    def written(self):
+        """ Record a write of the file, under the exclusive lock
+        """
+        os.pwrite(self._fd(), struct.pack("<Q", self.generation() + 1), 0)
+        self.synced()
+
+
+def get_file_state(name: str) -> FileState:
+    """ File state of model class name
+    """
+    state = FILE_STATES.get(name)
+    if state is None:
+        state = FILE_STATES.setdefault(name, FileState(name))
+    return state
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+""" Group commit module
+"""
+from os import getenv
+import atexit
+import threading
+
+
+GROUP_COMMIT_INTERVAL = float(getenv("GROUP_COMMIT_INTERVAL", "0"))
+GROUP_COMMIT_SIZE = int(getenv("GROUP_COMMIT_SIZE", "100"))
+GROUP_COMMIT_DURABLE = getenv("GROUP_COMMIT_DURABLE", "0") == "1"
+
+
+class GroupCommitter():
+    """ Coalesces the file writes of model classes
+
+    mark() records that a class has unsaved changes. A background thread
+    writes every dirty class once per ``interval`` seconds, or as soon as
+    ``max_dirty`` changes are pending, so bursts of saves cost one file
+    write per batch. Each flush has a generation number; mark(wait=True)
+    blocks until the flush that includes the change is on disk.
+    """
+
+    def __init__(self, interval: float, max_dirty: int):
+        """ Initialize the committer and start its flusher thread
+        """
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.dirty = {}
+        self.dirty_count = 0
+        self.generation = 0
+        self.flushed = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def mark(self, cls: type, wait: bool = False):
+        """ Record a change of cls, wait for it to be on disk if asked
+        """
+        with self.condition:
+            self.dirty[cls.__name__] = cls
+            self.dirty_count += 1
+            target = self.generation + 1
+            if self.dirty_count >= self.max_dirty:
+                self.condition.notify_all()
+            if wait:
+                self.condition.wait_for(lambda: self.flushed >= target)
+
+    def flush(self):
+        """ Write every dirty class now
+        """
+        with self.flush_lock:
+            with self.condition:
+                classes = list(self.dirty.values())
+                self.dirty.clear()
+                self.dirty_count = 0
+                self.generation += 1
+                generation = self.generation
+            try:
+                for cls in classes:
+                    cls.save_to_file(sync=True)
+            except Exception:
+                with self.condition:
+                    for cls in classes:
+                        self.dirty.setdefault(cls.__name__, cls)
+                raise
+            with self.condition:
+                self.flushed = generation
+                self.condition.notify_all()
+
+    def _run(self):
+        """ Flush loop of the background thread
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.dirty_count >= self.max_dirty,
+                    timeout=self.interval)
+                if not self.dirty:
+                    continue
+            try:
+                self.flush()
+            except Exception:
+                # the classes stay dirty and are retried on the next round
+                pass
+
+
+_committer = None
+_committer_lock = threading.Lock()
+
+
+def get_committer() -> GroupCommitter:
+    """ Process-wide committer configured from the environment
+    """
+    global _committer
+    with _committer_lock:
+        if _committer is None:
+            _committer = GroupCommitter(GROUP_COMMIT_INTERVAL,
+                                        GROUP_COMMIT_SIZE)
+        return _committer
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+""" Journal module
+"""
+from os import getenv, path
+import os
+import threading
+
+from models import codec
+
+
+JOURNAL_MAX_SIZE = int(getenv("JOURNAL_MAX_SIZE", str(4 * 1024 * 1024)))
+JOURNALS = {}
+
+
+def _line_start(f) -> bytes:
+    """ What to write before a new line at the end of f: a newline when a
+    torn line of an interrupted append ends it, so that the torn line is
+    not joined with the new one
+    """
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return b""
+    f.seek(size - 1)
+    return b"" if f.read(1) == b"\n" else b"\n"
+
+
+class Journal():
+    """ Append-only change log of one model class
+
+    Each line records one saved object (``{"id": ..., "obj": {...}}``) or
+    one removal (``"obj": null``) since the last snapshot in
+    ``.db_<Class>.json``. Once the journal is larger than both
+    JOURNAL_MAX_SIZE and the snapshot, it is compacted in a background
+    thread: the journal is rotated to ``.old``, ``.old`` is replayed over
+    the snapshot into a new snapshot, which replaces the old one as
+    ``.old`` is deleted. Replaying ``.old`` then the journal over the
+    snapshot gives the current state, also after a crash mid-compaction.
+
+    Compaction only reads the files, never the objects in memory, and
+    read() holds the journal lock while it reads them, so it never sees
+    the new snapshot without ``.old`` nor the old one without it.
+    """
+
+    def __init__(self, name: str):
+        """ Initialize the journal of model class name
+        """
+        self.path = ".db_{}.journal".format(name)
+        self.old_path = self.path + ".old"
+        self.snapshot_path = ".db_{}.json".format(name)
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    def append(self, obj_id: str, obj_json: dict):
+        """ Record obj_json (None for a removal) for obj_id
+        """
+        line = codec.dumps({"id": obj_id, "obj": obj_json}) + b"\n"
+        with self.lock:
+            with open(self.path, 'a+b') as f:
+                f.write(_line_start(f) + line)
+                size = f.tell()
+            if self.compacting or size <= JOURNAL_MAX_SIZE:
+                return
+            if path.exists(self.snapshot_path) and \
+                    size <= path.getsize(self.snapshot_path):
+                return
+            self.compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def read(self) -> dict:
+        """ Current records by id: the snapshot with the changes replayed
+        """
+        with self.lock:
+            objs_json = self._read_snapshot()
+            self.replay(objs_json)
+        return objs_json
+
+    def _read_snapshot(self) -> dict:
+        """ Records by id of the snapshot
+        """
+        if not path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, 'rb') as f:
+            return codec.loads(f.read())
+
+    def replay(self, objs_json: dict, file_paths: tuple = None):
+        """ Apply the changes journaled in file_paths (by default .old then
+        the journal) to objs_json in place
+        """
+        for file_path in file_paths or (self.old_path, self.path):
+            if not path.exists(file_path):
+                continue
+            with open(file_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = codec.loads(line)
+                    except ValueError:
+                        # torn last line of an interrupted append
+                        continue
+                    if record["obj"] is None:
+                        objs_json.pop(record["id"], None)
+                    else:
+                        objs_json[record["id"]] = record["obj"]
+
+    def compact(self):
+        """ Fold the journal into a new snapshot
+        """
+        try:
+            with self.lock:
+                if not path.exists(self.path):
+                    return
+                if path.exists(self.old_path):
+                    # a previous compaction did not finish: keep its lines
+                    with open(self.path, 'rb') as src, \
+                            open(self.old_path, 'a+b') as dst:
+                        dst.write(_line_start(dst) + src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.old_path)
+            # only compaction writes the snapshot and .old, so both can be
+            # read without the lock while save() appends to the journal
+            objs_json = self._read_snapshot()
+            self.replay(objs_json, (self.old_path,))
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(codec.dumps(objs_json))
+            with self.lock:
+                os.replace(tmp_path, self.snapshot_path)
+                os.remove(self.old_path)
+        finally:
+            self.compacting = False
+
+
+def get_journal(name: str) -> Journal:
+    """ Journal of model class name
+    """
+    journal = JOURNALS.get(name)
+    if journal is None:
+        journal = JOURNALS.setdefault(name, Journal(name))
+    return journal
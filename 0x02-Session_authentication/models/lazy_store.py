@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+""" Lazy store module
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from os import getenv
+from typing import Callable, Iterator, Tuple
+import threading
+
+
+OBJECT_STORE = getenv("OBJECT_STORE", "eager")
+OBJECT_CACHE_SIZE = int(getenv("OBJECT_CACHE_SIZE", "10000"))
+
+
+class LazyStore(MutableMapping):
+    """ Objects of one model class, built from their records on demand
+
+    The records (the dicts stored in ``.db_<Class>.json``, in a dict or
+    any mapping such as models.column_store.ColumnRecords) are read by
+    ``loader`` on first access, not when the store is created. Objects are
+    built from them by get(), search() and all() and kept in a cache of
+    at most ``cache_size`` objects, least recently used first out.
+
+    Storing an object saves a copy of its record: changes made to an
+    object after its last save are lost if the cache evicts it.
+    """
+
+    def __init__(self, model: type, loader: Callable[[], dict],
+                 cache_size: int = OBJECT_CACHE_SIZE):
+        """ Initialize a store of model objects whose records loader reads
+        """
+        self.model = model
+        self.loader = loader
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self._records = None
+
+    @property
+    def records(self) -> dict:
+        """ Records by id, read on first use
+        """
+        if self._records is None:
+            with self.lock:
+                if self._records is None:
+                    self._records = self.loader()
+        return self._records
+
+    def __getitem__(self, obj_id: str):
+        """ Object of obj_id, built from its record if not cached
+        """
+        with self.lock:
+            obj = self.cache.get(obj_id)
+            if obj is not None:
+                self.cache.move_to_end(obj_id)
+                return obj
+            obj = self.model(**self.records[obj_id])
+            self._cache(obj_id, obj)
+            return obj
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Store obj and a copy of its record
+        """
+        with self.lock:
+            self.records[obj_id] = obj.to_json(True)
+            self._cache(obj_id, obj)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove the object of obj_id
+        """
+        with self.lock:
+            del self.records[obj_id]
+            self.cache.pop(obj_id, None)
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Whether obj_id is stored, without building its object
+        """
+        return obj_id in self.records
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the stored ids
+        """
+        return iter(list(self.records))
+
+    def __len__(self) -> int:
+        """ Number of stored objects
+        """
+        return len(self.records)
+
+    def values(self) -> list:
+        """ All objects, from a single pass over the records
+        Objects that are not cached are built but not cached
+        """
+        objs = []
+        for obj_id, record in list(self.records.items()):
+            obj = self.cache.get(obj_id)
+            objs.append(obj if obj is not None else self.model(**record))
+        return objs
+
+    def serialized(self) -> Iterator[Tuple[str, dict]]:
+        """ (id, record) pairs, cached objects as they are now
+        Records are produced one at a time, so that saving does not build
+        a copy of all of them (see models.codec.dump_items)
+        """
+        with self.lock:
+            cache = self.cache
+            for obj_id, record in self.records.items():
+                obj = cache.get(obj_id)
+                yield obj_id, (obj.__dict__ if obj is not None else record)
+
+    def indexed_values(self, obj_id: str,
+                       attributes: Tuple[str, ...]) -> tuple:
+        """ Values of attributes for obj_id, without building its object
+        """
+        obj = self.cache.get(obj_id)
+        if obj is not None:
+            return obj._indexed_values()
+        record = self.records[obj_id]
+        return tuple(record.get(attribute) for attribute in attributes)
+
+    def _cache(self, obj_id: str, obj):
+        """ Put obj in the cache and evict beyond cache_size
+        """
+        self.cache[obj_id] = obj
+        self.cache.move_to_end(obj_id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+""" SQLite store module
+"""
+from collections.abc import MutableMapping
+from os import getenv, path
+from typing import Iterator, List, Tuple
+import sqlite3
+import threading
+
+from models import codec
+
+
+SQLITE_PATH = getenv("SQLITE_PATH", ".db.sqlite3")
+SQLITE_TIMEOUT = float(getenv("SQLITE_TIMEOUT", "30"))
+TABLES = {}
+_tables_lock = threading.Lock()
+
+
+def _quote(name: str) -> str:
+    """ Quoted SQL identifier
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column_value(value):
+    """ Value stored in an indexed column, None if SQLite cannot compare
+    it like Python does
+    """
+    if type(value) in (str, int, float):
+        return value
+    return None
+
+
+class SQLiteRecords(MutableMapping):
+    """ Records of one model class in a SQLite table
+
+    The table has the id as primary key, the encoded record, and one
+    indexed column per indexed attribute, so get(), count() and indexed
+    searches are answered by SQLite. Each write is its own transaction.
+    Connections are per thread; the database is in WAL mode so that
+    several processes can share it. On creation, the table is filled from
+    ``.db_<Class>.json`` if that file exists.
+    """
+
+    def __init__(self, name: str, indexed: Tuple[str, ...] = (),
+                 db_path: str = SQLITE_PATH):
+        """ Initialize the records of model class name, creating the table
+        """
+        self.name = name
+        self.indexed = tuple(indexed)
+        self.db_path = db_path
+        self.local = threading.local()
+        self.table = _quote(name)
+        columns = ", ".join(("id", "record") + tuple(
+            _quote(attribute) for attribute in self.indexed))
+        self.insert_sql = "INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(
+            self.table, columns, ", ".join("?" * (2 + len(self.indexed))))
+        self._create()
+
+    def connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self.local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = conn
+        return conn
+
+    def _create(self):
+        """ Create the table and its indexes if needed
+        The check, the DDL and the migration of ``.db_<Class>.json`` are
+        one immediate transaction: a process setting up the same table
+        at the same time waits, then finds it complete
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in conn.execute(
+                "PRAGMA table_info({})".format(self.table))]
+            if not columns:
+                conn.execute(
+                    "CREATE TABLE {} (id TEXT PRIMARY KEY, record BLOB NOT "
+                    "NULL{})".format(self.table, "".join(
+                        ", " + _quote(attribute)
+                        for attribute in self.indexed)))
+                json_path = ".db_{}.json".format(self.name)
+                records = {}
+                if path.exists(json_path):
+                    with open(json_path, 'rb') as f:
+                        records = codec.loads(f.read())
+                conn.executemany(self.insert_sql, (
+                    self._row(obj_id, record)
+                    for obj_id, record in records.items()))
+            else:
+                missing = [attribute for attribute in self.indexed
+                           if attribute not in columns]
+                for attribute in missing:
+                    conn.execute("ALTER TABLE {} ADD COLUMN {}".format(
+                        self.table, _quote(attribute)))
+                if missing:
+                    # new indexed columns: fill them from the records
+                    rows = conn.execute("SELECT id, record FROM {}".format(
+                        self.table)).fetchall()
+                    conn.executemany(self.insert_sql, (
+                        self._row(obj_id, codec.loads(record))
+                        for obj_id, record in rows))
+            for attribute in self.indexed:
+                conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    _quote("{}_{}".format(self.name, attribute)),
+                    self.table, _quote(attribute)))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _row(self, obj_id: str, record: dict) -> tuple:
+        """ Values inserted for record
+        """
+        return (obj_id, codec.dumps(record)) + tuple(
+            _column_value(record.get(attribute))
+            for attribute in self.indexed)
+
+    def __getitem__(self, obj_id: str) -> dict:
+        """ Record of obj_id
+        """
+        row = self.connection().execute(
+            "SELECT record FROM {} WHERE id = ?".format(self.table),
+            (obj_id,)).fetchone()
+        if row is None:
+            raise KeyError(obj_id)
+        return codec.loads(row[0])
+
+    def __setitem__(self, obj_id: str, record: dict):
+        """ Store record for obj_id
+        """
+        conn = self.connection()
+        with conn:
+            conn.execute(self.insert_sql, self._row(obj_id, record))
+
+    def update(self, records: dict = (), **kwargs):
+        """ Store many records in one transaction
+        """
+        records = dict(records, **kwargs)
+        conn = self.connection()
+        with conn:
+            conn.executemany(self.insert_sql, (
+                self._row(obj_id, record)
+                for obj_id, record in records.items()))
+
+    def __delitem__(self, obj_id: str):
+        """ Remove the record of obj_id
+        """
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM {} WHERE id = ?".format(self.table), (obj_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(obj_id)
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Whether obj_id is stored
+        """
+        return self.connection().execute(
+            "SELECT 1 FROM {} WHERE id = ?".format(self.table),
+            (obj_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the stored ids
+        """
+        rows = self.connection().execute(
+            "SELECT id FROM {} ORDER BY rowid".format(self.table)).fetchall()
+        return (row[0] for row in rows)
+
+    def __len__(self) -> int:
+        """ Number of stored records
+        """
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM {}".format(self.table)).fetchone()[0]
+
+    def items(self) -> List[tuple]:
+        """ (id, record) pairs, read in one query
+        """
+        rows = self.connection().execute(
+            "SELECT id, record FROM {} ORDER BY rowid".format(
+                self.table)).fetchall()
+        return [(obj_id, codec.loads(record)) for obj_id, record in rows]
+
+    def add(self, obj_id: str, values: tuple):
+        """ Nothing to do: indexed columns are written with the records
+        """
+
+    def discard(self, obj_id: str):
+        """ Nothing to do: indexed columns are written with the records
+        """
+
+    def lookup(self, attribute: str, value) -> List[str]:
+        """ Ids that may hold value for attribute
+        Values SQLite cannot compare match every row
+        """
+        column_value = _column_value(value)
+        if column_value is None and value is not None:
+            return list(self)
+        if value is None:
+            sql = "SELECT id FROM {} WHERE {} IS NULL"
+            args = ()
+        else:
+            sql = "SELECT id FROM {} WHERE {} = ?"
+            args = (column_value,)
+        rows = self.connection().execute(
+            sql.format(self.table, _quote(attribute)), args).fetchall()
+        return [row[0] for row in rows]
+
+
+def get_records(name: str, indexed: Tuple[str, ...] = ()) -> SQLiteRecords:
+    """ Records of model class name, the table being set up once
+    """
+    with _tables_lock:
+        records = TABLES.get(name)
+        if records is None:
+            records = TABLES[name] = SQLiteRecords(name, indexed)
+        return records
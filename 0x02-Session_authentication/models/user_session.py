@@ -8,6 +8,9 @@ from models.base import Base
 class UserSession(Base):
     """UserSession class for storing session in DB
     """
+
+    indexed_attributes = ('session_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a new UserSession instance
         """
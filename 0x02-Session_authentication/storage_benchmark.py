@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+""" Storage benchmark
+
+Times User.save_to_file and User.load_from_file on a generated set of
+users with every installed JSON codec (see models.codec).
+
+    python3 storage_benchmark.py --users 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from models import base, codec
+from models.user import User
+
+
+def make_users(count: int):
+    """ Fill the User store with count users
+    """
+    base.DATA["User"] = {}
+    for i in range(count):
+        user = User()
+        user.email = "user{}@example.com".format(i)
+        user.password = "pwd{}".format(i)
+        user.first_name = "First{}".format(i)
+        user.last_name = "Last{}".format(i)
+        base.DATA["User"][user.id] = user
+    User._reindex()
+
+
+def best_of(func, repeat: int) -> float:
+    """ Best wall time of func over repeat runs
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="User storage benchmark")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    make_users(args.users)
+    print("{:<8} {:>10} {:>10} {:>10}".format(
+        "codec", "save s", "load s", "file MB"))
+    for name in codec.CODECS:
+        try:
+            codec._codec = codec.Codec(name)
+        except ImportError:
+            continue
+        save = best_of(User.save_to_file, args.repeat)
+        size = os.path.getsize(".db_User.json")
+        load = best_of(User.load_from_file, args.repeat)
+        assert User.count() == args.users
+        print("{:<8} {:>10.3f} {:>10.3f} {:>10.1f}".format(
+            name, save, load, size / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+""" Store stress test
+
+Starts N processes that each create users concurrently in the same
+directory, then checks that no creation was lost and that a process
+which loaded the users before sees them all.
+
+    python3 store_stress.py --processes 8 --users 200
+
+Exits with status 1 when users are missing.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+
+def create_users(directory: str, worker: int, count: int):
+    """ Create count users from one process
+    """
+    os.chdir(directory)
+    from models.user import User
+    User.load_from_file()
+    for i in range(count):
+        user = User(email="worker{}-{}@example.com".format(worker, i))
+        user.password = "pwd"
+        user.save()
+
+
+def main():
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Store stress test")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--users", type=int, default=200,
+                        help="users created by each process")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+    from models.user import User
+    User.load_from_file()
+
+    started = time.perf_counter()
+    workers = [multiprocessing.Process(target=create_users,
+                                       args=(directory, worker, args.users))
+               for worker in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    expected = args.processes * args.users
+    found = User.count()
+    missing = [
+        (worker, i)
+        for worker in range(args.processes) for i in range(args.users)
+        if not User.search({"email": "worker{}-{}@example.com".format(
+            worker, i)})
+    ]
+    print("{} processes created {} users in {:.2f} s ({:.0f} saves/s)"
+          .format(args.processes, expected, elapsed, expected / elapsed))
+    print("stored {}, missing {}".format(found, len(missing)))
+    if found != expected or missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
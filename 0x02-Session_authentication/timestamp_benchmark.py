@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+""" Timestamp benchmark
+
+Per-object cost of building users from their stored records and of
+to_json(), with the strptime/strftime timestamps Base used before and
+with models.codec.parse_timestamp/format_timestamp.
+
+    python3 timestamp_benchmark.py --users 100000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from models import base
+from models.codec import TIMESTAMP_FORMAT, format_timestamp, parse_timestamp
+from models.user import User
+
+
+def make_records(count: int) -> list:
+    """ Records of count users as load_from_file() reads them
+    """
+    started = datetime(2024, 1, 1)
+    records = []
+    for i in range(count):
+        stamp = (started + timedelta(seconds=i * 37)).strftime(
+            TIMESTAMP_FORMAT)
+        records.append({
+            "id": str(i), "created_at": stamp, "updated_at": stamp,
+            "email": "user{}@example.com".format(i), "_password": "x" * 64,
+            "first_name": "First", "last_name": "Last",
+        })
+    return records
+
+
+def per_object(func, items: list, repeat: int) -> float:
+    """ Best cost in microseconds of func per item
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1e6
+
+
+def main():
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Timestamp benchmark")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    records = make_records(args.users)
+    base.DATA["User"] = {}
+    variants = (
+        ("strptime", lambda value: datetime.strptime(value,
+                                                     TIMESTAMP_FORMAT),
+         lambda value: value.strftime(TIMESTAMP_FORMAT)),
+        ("fast", parse_timestamp, format_timestamp),
+    )
+    print("{:<10} {:>12} {:>12}".format("timestamps", "load us/obj",
+                                        "to_json us/obj"))
+    for name, parse, format_ in variants:
+        base.parse_timestamp = parse
+        base.format_timestamp = format_
+        load = per_object(lambda record: User(**record), records,
+                          args.repeat)
+        users = [User(**record) for record in records]
+        dump = per_object(User.to_json, users, args.repeat)
+        print("{:<10} {:>12.2f} {:>12.2f}".format(name, load, dump))
+
+
+if __name__ == "__main__":
+    main()